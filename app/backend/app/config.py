@@ -23,6 +23,22 @@ class Settings(BaseSettings):
 
     # Crew Endpoint
     CREW_ENDPOINT_URL: Optional[str] = "http://localhost:8001"  # Default placeholder
+    CREW_TIMEOUT_SECONDS: float = 5.0         # deadline for create calls (and stream connect)
+    CREW_STATUS_TIMEOUT_SECONDS: float = 3.0  # deadline for status polls
+    CREW_MAX_CONNECTIONS: int = 100
+    CREW_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    CREW_BREAKER_THRESHOLD: int = 5           # consecutive failures before the circuit opens
+    CREW_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    # Completion webhooks: crew-api POSTs to CREW_CALLBACK_URL, signed with CREW_CALLBACK_SECRET
+    # (crew-api's CALLBACK_SECRET). Both must be set, otherwise status is synced by polling only.
+    CREW_CALLBACK_URL: Optional[str] = None   # e.g. https://api.example.com/ads/callbacks/crew
+    CREW_CALLBACK_SECRET: Optional[str] = None
+    CREW_CALLBACK_MAX_SKEW_SECONDS: int = 300
+
+    # Status cache: concurrent polls of one ad share a single DynamoDB read and crew-api call
+    STATUS_CACHE_TTL_SECONDS: float = 1.0             # runs still in progress
+    STATUS_CACHE_TERMINAL_TTL_SECONDS: float = 3600.0  # GENERATED / FAILED ads
+    STATUS_CACHE_MAX_ENTRIES: int = 10000
 
     # Application
     DEBUG: bool = False
@@ -1,12 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.routes import auth, ads
+from app.services.crew_client import crew_client
+from app.utils.status_cache import status_cache
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # One pooled connection set to crew-api for the whole process
+    await crew_client.start()
+    try:
+        yield
+    finally:
+        await crew_client.close()
+
 
 app = FastAPI(
     title="Ad Video Generator API",
     description="API for generating short ad videos",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -54,7 +69,7 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "crew_client": crew_client.stats(), "status_cache": status_cache.stats()}
 
 
 if __name__ == "__main__":
@@ -1,13 +1,18 @@
+from contextlib import AsyncExitStack
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-import requests
+import httpx
+import json
 import uuid
 import logging
 from app.database import dynamodb_service
 from app.models.user import User
 from app.models.adv import AdvStatus
 from app.utils.rate_limiter import rate_limit
+from app.utils.status_cache import status_cache
 from app.schemas.adv import (
     AdvertisementCreate,
     AdvertisementResponse,
@@ -18,6 +23,7 @@ from app.schemas.adv import (
 )
 from app.services.auth_service import get_current_user
 from app.services.s3_service import s3_service
+from app.services.crew_client import crew_client, callbacks_enabled, verify_callback, CrewUnavailableError
 from app.config import settings
 
 router = APIRouter(prefix="/ads", tags=["Advertisements"])
@@ -38,19 +44,19 @@ def _get_user_advertisement_or_404(
 
 @router.post("", response_model=AdvertisementCreateResponse, status_code=status.HTTP_201_CREATED)
 @rate_limit(max_requests=5, window_seconds=60)  # 5 creates per minute
-def create_advertisement(
+async def create_advertisement(
     ad_data: AdvertisementCreate,
     current_user: User = Depends(get_current_user)
 ):
     run_id = str(uuid.uuid4())
-    ad_item = dynamodb_service.create_advertisement(current_user.email, {
+    ad_item = await run_in_threadpool(dynamodb_service.create_advertisement, current_user.email, {
         'name': ad_data.name,
         'desc': ad_data.desc,
         'run_id': run_id,
         'status': AdvStatus.IN_PROGRESS.value
     })
 
-    if not settings.CREW_ENDPOINT_URL:
+    if not crew_client.configured:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Crew endpoint not configured"
@@ -61,17 +67,16 @@ def create_advertisement(
         "desc": ad_data.desc,
         "run_id": run_id
     }
+    if callbacks_enabled():
+        crew_payload["callback_url"] = settings.CREW_CALLBACK_URL
+        crew_payload["callback_context"] = {"user_id": current_user.email}
 
     try:
-        crew_response = requests.post(f"{settings.CREW_ENDPOINT_URL}/generate-ad", json=crew_payload, timeout=5)
-        crew_response.raise_for_status()
-    except requests.RequestException as e:
+        await crew_client.generate_ad(crew_payload)
+    except CrewUnavailableError as e:
         logging.error(f"Crew API error: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-            logging.error(f"Crew API response status: {e.response.status_code}")
-            logging.error(f"Crew API response text: {e.response.text}")
         logging.error(f"Payload sent: {crew_payload}")
-        dynamodb_service.update_advertisement(current_user.email, ad_item['run_id'], {
+        await run_in_threadpool(dynamodb_service.update_advertisement, current_user.email, ad_item['run_id'], {
             'status': AdvStatus.FAILED.value
         })
         raise HTTPException(
@@ -82,13 +87,79 @@ def create_advertisement(
     return AdvertisementCreateResponse(run_id=run_id, status=AdvStatus.IN_PROGRESS)
 
 
+@router.post("/callbacks/crew", include_in_schema=False)
+async def crew_completion_callback(request: Request):
+    """Signed webhook from crew-api when a run completes or fails; settles the ad row once."""
+    body = await request.body()
+    if not verify_callback(body, request.headers.get("X-Crew-Timestamp"), request.headers.get("X-Crew-Signature")):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid callback signature"
+        )
+
+    try:
+        payload = json.loads(body)
+        run_id = payload["run_id"]
+        user_id = (payload.get("context") or {})["user_id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malformed callback"
+        )
+
+    ad = await run_in_threadpool(dynamodb_service.get_advertisement, user_id, run_id)
+    if not ad:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Advertisement not found"
+        )
+
+    final_video_uri = payload.get("final_video_uri")
+    if payload.get("status") == "COMPLETED" and final_video_uri:
+        new_status = AdvStatus.GENERATED
+    else:
+        new_status = AdvStatus.FAILED
+
+    # Retried deliveries are no-ops
+    if ad['status'] == new_status.value and (
+        new_status == AdvStatus.FAILED or ad.get('final_video_uri') == final_video_uri
+    ):
+        return {"status": "unchanged"}
+
+    updates = {'status': new_status.value, 'updated_at': None}
+    if payload.get("crew_status"):
+        updates['crew_status'] = payload["crew_status"]
+    if new_status == AdvStatus.GENERATED:
+        updates['final_video_uri'] = final_video_uri
+    else:
+        updates['status_reason'] = payload.get("error") or "One or more generation steps failed"
+
+    if not await run_in_threadpool(dynamodb_service.update_advertisement, user_id, run_id, updates):
+        # 5xx makes crew-api retry the delivery
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update advertisement"
+        )
+    status_cache.invalidate((user_id, run_id))
+    return {"status": "updated"}
+
+
 @router.get("/{run_id}/status", response_model=AdvertisementStatusResponse)
 @rate_limit(max_requests=15, window_seconds=1)  # 15 requests per second for polling
-def get_advertisement_status(
+async def get_advertisement_status(
     run_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    ad = _get_user_advertisement_or_404(run_id, current_user)
+    # Keyed by owner as well, so a cached answer is never served to another user
+    return await status_cache.get(
+        (current_user.email, run_id),
+        lambda: _fetch_advertisement_status(run_id, current_user),
+        is_terminal=lambda response: response.status in (AdvStatus.GENERATED, AdvStatus.FAILED),
+    )
+
+
+async def _fetch_advertisement_status(run_id: str, current_user: User) -> AdvertisementStatusResponse:
+    ad = await run_in_threadpool(_get_user_advertisement_or_404, run_id, current_user)
 
     if not ad.get('run_id'):
         return AdvertisementStatusResponse(
@@ -97,60 +168,108 @@ def get_advertisement_status(
             crew_status=None
         )
 
-    try:
-        status_response = requests.get(f"{settings.CREW_ENDPOINT_URL}/runs/{ad['run_id']}/status", timeout=5)
-        status_response.raise_for_status()
-        status_data = status_response.json()
-
-        new_status = AdvStatus.IN_PROGRESS
-
-        failed_steps = [
-            status_data.get("script_generation_status") == "FAILED",
-            status_data.get("script_evaluation_status") == "FAILED",
-            status_data.get("video_generation_status") == "FAILED",
-            status_data.get("audio_generation_status") == "FAILED",
-            status_data.get("editing_status") == "FAILED"
-        ]
-
-        if any(failed_steps):
-            new_status = AdvStatus.FAILED
-        else:
-            steps_status = [
-                status_data.get("script_generation_status") == "COMPLETED",
-                status_data.get("script_evaluation_status") == "COMPLETED",
-                status_data.get("video_generation_status") == "COMPLETED",
-                status_data.get("audio_generation_status") == "COMPLETED",
-                status_data.get("editing_status") == "COMPLETED",
-                "final_video_uri" in status_data and status_data["final_video_uri"]
-            ]
-
-            if all(steps_status):
-                new_status = AdvStatus.GENERATED
-                if "final_video_uri" in status_data and not ad.get('final_video_uri'):
-                    dynamodb_service.update_advertisement(current_user.email, run_id, {
-                        'final_video_uri': status_data["final_video_uri"],
-                        'status': new_status.value
-                    })
-
-        if new_status.value != ad['status']:
-            updates = {'status': new_status.value}
-            if new_status == AdvStatus.FAILED:
-                updates['status_reason'] = "One or more generation steps failed"
-            dynamodb_service.update_advertisement(current_user.email, run_id, updates)
-
+    # Finished ads no longer change; their row was settled by the completion callback or an earlier poll
+    if ad['status'] in (AdvStatus.GENERATED.value, AdvStatus.FAILED.value):
         return AdvertisementStatusResponse(
             run_id=ad['run_id'],
-            status=new_status,
-            crew_status=status_data
+            status=AdvStatus(ad['status']),
+            crew_status=ad.get('crew_status')
         )
 
-    except requests.RequestException:
+    try:
+        status_data = await crew_client.get_status(ad['run_id'])
+    except CrewUnavailableError:
         return AdvertisementStatusResponse(
             run_id=ad['run_id'],
             status=AdvStatus(ad['status']),
             crew_status=None
         )
 
+    new_status = AdvStatus.IN_PROGRESS
+
+    failed_steps = [
+        status_data.get("script_generation_status") == "FAILED",
+        status_data.get("script_evaluation_status") == "FAILED",
+        status_data.get("video_generation_status") == "FAILED",
+        status_data.get("audio_generation_status") == "FAILED",
+        status_data.get("editing_status") == "FAILED"
+    ]
+
+    if any(failed_steps):
+        new_status = AdvStatus.FAILED
+    else:
+        steps_status = [
+            status_data.get("script_generation_status") == "COMPLETED",
+            status_data.get("script_evaluation_status") == "COMPLETED",
+            status_data.get("video_generation_status") == "COMPLETED",
+            status_data.get("audio_generation_status") == "COMPLETED",
+            status_data.get("editing_status") == "COMPLETED",
+            "final_video_uri" in status_data and status_data["final_video_uri"]
+        ]
+
+        if all(steps_status):
+            new_status = AdvStatus.GENERATED
+            if "final_video_uri" in status_data and not ad.get('final_video_uri'):
+                await run_in_threadpool(dynamodb_service.update_advertisement, current_user.email, run_id, {
+                    'final_video_uri': status_data["final_video_uri"],
+                    'status': new_status.value
+                })
+
+    if new_status.value != ad['status']:
+        updates = {'status': new_status.value}
+        if new_status == AdvStatus.FAILED:
+            updates['status_reason'] = "One or more generation steps failed"
+        await run_in_threadpool(dynamodb_service.update_advertisement, current_user.email, run_id, updates)
+
+    return AdvertisementStatusResponse(
+        run_id=ad['run_id'],
+        status=new_status,
+        crew_status=status_data
+    )
+
+
+@router.get("/{run_id}/events")
+@rate_limit(max_requests=10, window_seconds=60)  # one long-lived stream replaces status polling
+async def stream_advertisement_events(
+    run_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Proxy crew-api's Server-Sent Events status stream for one of the user's ads."""
+    ad = await run_in_threadpool(_get_user_advertisement_or_404, run_id, current_user)
+
+    if not crew_client.configured:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Crew endpoint not configured"
+        )
+
+    # Open the upstream before answering so connection errors still become a 502
+    upstream_ctx = AsyncExitStack()
+    try:
+        upstream = await upstream_ctx.enter_async_context(crew_client.stream_events(ad['run_id']))
+    except CrewUnavailableError as e:
+        logging.error(f"Crew API event stream error for {run_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Status stream unavailable"
+        )
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                if chunk:
+                    yield chunk
+        except (CrewUnavailableError, httpx.HTTPError) as e:
+            logging.warning(f"Crew API event stream for {run_id} ended: {e}")
+        finally:
+            await upstream_ctx.aclose()
+
+    return StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.get("/{run_id}/video-url", response_model=VideoUrlResponse)
 @rate_limit(max_requests=10, window_seconds=60)  # 10 video URL requests per minute
@@ -256,6 +375,7 @@ def update_advertisement(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update advertisement"
         )
+    status_cache.invalidate((current_user.email, run_id))
 
     # Get updated advertisement
     updated_ad = dynamodb_service.get_advertisement(current_user.email, run_id)
@@ -0,0 +1,183 @@
+import hashlib
+import hmac
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when the h2 package is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def callbacks_enabled() -> bool:
+    return bool(settings.CREW_CALLBACK_URL and settings.CREW_CALLBACK_SECRET)
+
+
+def verify_callback(body: bytes, timestamp: Optional[str], signature: Optional[str]) -> bool:
+    """Check crew-api's X-Crew-Signature (HMAC-SHA256 of "<timestamp>.<body>") and reject stale timestamps."""
+    if not (settings.CREW_CALLBACK_SECRET and timestamp and signature):
+        return False
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    if age > settings.CREW_CALLBACK_MAX_SKEW_SECONDS:
+        return False
+    mac = hmac.new(settings.CREW_CALLBACK_SECRET.encode(), f"{timestamp}.".encode() + body, hashlib.sha256)
+    return hmac.compare_digest(f"sha256={mac.hexdigest()}", signature)
+
+
+class CrewUnavailableError(Exception):
+    """crew-api could not be reached, timed out, failed, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds. After that one trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        # A trial that never reported back (e.g. a cancelled request) expires after one cooldown
+        now = time.monotonic()
+        if state == "half-open" and (self._trial_started is None or now - self._trial_started >= self.cooldown):
+            self._trial_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started = None
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning(f"Crew API circuit opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+
+class CrewClient:
+    """Shared async client for crew-api. Call start() at app startup and close() at shutdown."""
+
+    def __init__(self):
+        self.base_url = (settings.CREW_ENDPOINT_URL or "").rstrip("/")
+        self.breaker = CircuitBreaker(settings.CREW_BREAKER_THRESHOLD, settings.CREW_BREAKER_COOLDOWN_SECONDS)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.base_url)
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=settings.CREW_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.CREW_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CREW_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30,
+            ),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def generate_ad(self, payload: dict) -> dict:
+        response = await self._request("POST", "/generate-ad", settings.CREW_TIMEOUT_SECONDS, json=payload)
+        return response.json()
+
+    async def get_status(self, run_id: str) -> dict:
+        response = await self._request("GET", f"/runs/{run_id}/status", settings.CREW_STATUS_TIMEOUT_SECONDS)
+        return response.json()
+
+    @asynccontextmanager
+    async def stream_events(self, run_id: str) -> AsyncIterator[httpx.Response]:
+        """Open crew-api's SSE stream; the read timeout stays above its 15s keep-alive."""
+        client = self._require_client()
+        if not self.breaker.allow():
+            raise CrewUnavailableError("Crew API circuit open")
+        timeout = httpx.Timeout(settings.CREW_TIMEOUT_SECONDS, read=60)
+        try:
+            async with client.stream(
+                "GET", f"/runs/{run_id}/events", timeout=timeout, headers={"Accept": "text/event-stream"}
+            ) as response:
+                response.raise_for_status()
+                self.breaker.record_success()
+                yield response
+        except httpx.HTTPStatusError as e:
+            self._record(e.response.status_code)
+            raise CrewUnavailableError(f"Crew API returned {e.response.status_code}") from e
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            raise CrewUnavailableError(str(e) or type(e).__name__) from e
+
+    async def _request(self, method: str, path: str, deadline: float, **kwargs) -> httpx.Response:
+        """One call with its own deadline; 5xx, timeouts and connection errors count against the breaker."""
+        client = self._require_client()
+        if not self.breaker.allow():
+            raise CrewUnavailableError("Crew API circuit open")
+        try:
+            response = await client.request(method, path, timeout=deadline, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            self._record(e.response.status_code)
+            raise CrewUnavailableError(f"Crew API returned {e.response.status_code}: {e.response.text}") from e
+        except httpx.TransportError as e:
+            self.breaker.record_failure()
+            raise CrewUnavailableError(str(e) or type(e).__name__) from e
+        self.breaker.record_success()
+        return response
+
+    def _record(self, status_code: int) -> None:
+        # 4xx means crew-api is up and answered; only server errors trip the breaker
+        if status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _require_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise CrewUnavailableError("Crew API client not started")
+        return self._client
+
+    def stats(self) -> dict:
+        return {"breaker": self.breaker.state, "consecutive_failures": self.breaker.failures, "http2": HTTP2_AVAILABLE}
+
+
+crew_client = CrewClient()
@@ -0,0 +1,101 @@
+"""
+In-process cache for ad status lookups
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.config import settings
+
+
+class StatusCache:
+    """
+    TTL cache with single-flight loading.
+
+    Concurrent get() calls for the same key share one in-flight fetch, so
+    the number of upstream calls follows the number of keys, not of callers.
+    Values for which is_terminal(value) is true are kept for terminal_ttl
+    seconds, everything else for ttl. Failed fetches are not cached.
+    """
+
+    def __init__(self, ttl: float, terminal_ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.terminal_ttl = terminal_ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        is_terminal: Callable[[Any], bool] = lambda value: False,
+    ) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                # shield: a cancelled waiter must not cancel the fetch others are waiting on
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this waiter was cancelled
+                # the leading request went away mid-fetch; start over
+                return await self.get(key, fetch, is_terminal)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+        ttl = self.terminal_ttl if is_terminal(value) else self.ttl
+        if ttl > 0:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+# Global status cache instance
+status_cache = StatusCache(
+    ttl=settings.STATUS_CACHE_TTL_SECONDS,
+    terminal_ttl=settings.STATUS_CACHE_TERMINAL_TTL_SECONDS,
+    max_entries=settings.STATUS_CACHE_MAX_ENTRIES,
+)
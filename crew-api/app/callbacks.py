@@ -0,0 +1,113 @@
+# app/callbacks.py
+# ------------------------------------------------------------
+# Signed completion webhooks.
+#
+# A run submitted with callback_url gets exactly one POST when it completes
+# or fails:
+#   {"run_id", "status": "COMPLETED"|"FAILED", "final_video_uri", "error",
+#    "context": <callback_context as submitted>, "crew_status": {...}}
+# Headers:
+#   X-Crew-Timestamp  unix seconds
+#   X-Crew-Signature  sha256=<hex HMAC-SHA256 of "<timestamp>.<body>" with CALLBACK_SECRET>
+# Receivers should reject stale timestamps as well as bad signatures.
+# callback_url must match one of CALLBACK_ALLOWED_PREFIXES: same scheme, host
+# and port, no userinfo, and a path under the entry's path (whole segments).
+# With none configured every callback_url is refused, so crew-api never
+# POSTs to arbitrary (internal, metadata) hosts on a client's behalf.
+# ------------------------------------------------------------
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import SplitResult, urlsplit
+
+import requests
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET", "")
+CALLBACK_TIMEOUT_SECS = float(os.getenv("CALLBACK_TIMEOUT_SECS", "5"))
+# Comma-separated URL prefixes callbacks may target (empty = callbacks refused)
+CALLBACK_ALLOWED_PREFIXES = [p.strip() for p in os.getenv("CALLBACK_ALLOWED_PREFIXES", "").split(",") if p.strip()]
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _endpoint(parts: SplitResult):
+    """(scheme, host, port) of an http(s) URL without userinfo, else None."""
+    try:
+        port = parts.port or _DEFAULT_PORTS.get(parts.scheme)
+    except ValueError:   # port out of range / not a number
+        return None
+    if parts.scheme not in _DEFAULT_PORTS or not parts.hostname or "@" in parts.netloc:
+        return None
+    return parts.scheme, parts.hostname, port
+
+
+def callback_allowed(url: str) -> bool:
+    parts = urlsplit(url)
+    endpoint = _endpoint(parts)
+    segments = parts.path.split("/")
+    if endpoint is None or "." in segments or ".." in segments:
+        return False
+    for prefix in CALLBACK_ALLOWED_PREFIXES:
+        allowed = urlsplit(prefix)
+        if _endpoint(allowed) != endpoint:
+            continue
+        base = allowed.path.rstrip("/")
+        if not base or parts.path == base or parts.path.startswith(base + "/"):
+            return True
+    return False
+
+
+def sign(body: bytes, timestamp: str, secret: str = CALLBACK_SECRET) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256)
+    return f"sha256={mac.hexdigest()}"
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10),
+       retry=retry_if_exception_type(requests.RequestException))
+def _post(url: str, body: bytes) -> None:
+    # Signed per attempt so retries carry a fresh timestamp
+    timestamp = str(int(time.time()))
+    resp = requests.post(
+        url,
+        data=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-Crew-Timestamp": timestamp,
+            "X-Crew-Signature": sign(body, timestamp),
+        },
+        timeout=CALLBACK_TIMEOUT_SECS,
+    )
+    if resp.status_code >= 500:
+        resp.raise_for_status()
+    if resp.status_code >= 400:
+        print(f"[callback] {url} rejected the callback: {resp.status_code} {resp.text[:200]}")
+
+
+def send_completion(callback: Optional[Dict[str, Any]], run_id: str, status: str,
+                    final_video_uri: Optional[str] = None, error: Optional[str] = None,
+                    crew_status: Optional[Dict[str, Any]] = None) -> None:
+    """Best effort: failures are logged, never raised into the job."""
+    if not callback or not callback.get("url"):
+        return
+    if not CALLBACK_SECRET:
+        print(f"[callback] CALLBACK_SECRET is not set; not calling back for {run_id}")
+        return
+    body = json.dumps({
+        "run_id": run_id,
+        "status": status,
+        "final_video_uri": final_video_uri,
+        "error": error,
+        "context": callback.get("context"),
+        "crew_status": crew_status,
+    }, default=str).encode()
+    try:
+        _post(callback["url"], body)
+        print(f"[callback] {run_id} {status} -> {callback['url']}")
+    except Exception as exc:
+        print(f"[callback] giving up on {callback['url']} for {run_id}: {exc}")
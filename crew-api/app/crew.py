@@ -1,7 +1,11 @@
+import json
 import pathlib
 # from dotenv import load_dotenv
 from .agents import planning_agent, script_agent, evaluation_agent, image_agent, video_agent, audio_agent, editor_agent
-from .tasks import build_crew, run_pipeline
+from .tasks import build_crew, run_pipeline, BUCKET, DEFAULT_PREFIX, MAX_WORDS_PER_DIALOGUE, _enforce_dialogue_caps
+from .manifest import RunManifest
+from .scene_diff import carry_over
+from .tools.script_tools import save_script_s3
 from .tools.idea_tools import generate_ad_idea
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,10 +14,59 @@ load_dotenv()
 import os
 if not os.getenv("OPENAI_API_KEY"):
     os.environ["OPENAI_API_KEY"] = "unused"
+# Checkpoint every finished stage to outputs/<RUN_ID>/manifest.json so a run can be resumed
+RUN_CHECKPOINTS = os.getenv("RUN_CHECKPOINTS", "1") == "1"
+
 def load_text(path):
     return pathlib.Path(path).read_text(encoding="utf-8")
 
-def run(product_name, product_desc,current_run_id):
+def _run_prefix(run_id):
+    return f"{DEFAULT_PREFIX}/{run_id}"
+
+def load_manifest(run_id):
+    """Stored checkpoint manifest for a run, or None."""
+    return RunManifest.load(BUCKET, _run_prefix(run_id))
+
+def resume(current_run_id, manifest=None):
+    """
+    Re-run a previous run from its manifest: stages already recorded there
+    (idea, script, eval, per-scene assets, concat outputs) are not repeated.
+    """
+    if manifest is None:
+        manifest = load_manifest(current_run_id)
+    if manifest is None:
+        raise LookupError(f"No manifest found for run {current_run_id}")
+    params = manifest.params
+    return run(params.get("product_name", ""), params.get("product_desc", ""),
+               current_run_id, manifest=manifest)
+
+def edit_scene(current_run_id, scene_id, changes):
+    """
+    Apply field changes to one scene of the approved script and invalidate
+    only the assets they affect (see app/scene_diff.py). The next resume
+    reuses every other scene's image, clip and voice-over and re-renders.
+    Returns {"regenerate": [...], "reused": [...]} stage names.
+    """
+    manifest = load_manifest(current_run_id)
+    if manifest is None:
+        raise LookupError(f"No manifest found for run {current_run_id}")
+    old_script = manifest.outputs("evaluate").get("script")
+    if not old_script:
+        raise ValueError(f"Run {current_run_id} has no approved script yet")
+    new_script = json.loads(json.dumps(old_script))
+    scene = next((sc for sc in new_script.get("scenes", []) if str(sc.get("id")) == str(scene_id)), None)
+    if scene is None:
+        raise LookupError(f"Run {current_run_id} has no scene {scene_id}")
+    scene.update(changes)
+    new_script = _enforce_dialogue_caps(new_script, MAX_WORDS_PER_DIALOGUE)
+
+    plan = carry_over(manifest, old_script, new_script)
+    if plan["regenerate"]:
+        save_script_s3(new_script, BUCKET, f"{_run_prefix(current_run_id)}/script/script.json")
+        manifest.save()
+    return plan
+
+def run(product_name, product_desc,current_run_id, manifest=None, callback=None):
 
 
     # Load prompts
@@ -22,7 +75,21 @@ def run(product_name, product_desc,current_run_id):
     idea_prompt   = load_text(os.path.join(os.path.dirname(__file__), "prompts/idea_prompt.md"))
 
     
-    chosen_idea = generate_ad_idea(product_name, product_desc, idea_prompt)
+    if manifest is None and RUN_CHECKPOINTS:
+        manifest = RunManifest(BUCKET, _run_prefix(current_run_id), current_run_id, params={
+            "product_name": product_name,
+            "product_desc": product_desc,
+        })
+        if callback:
+            # Resumed and edited runs call back to the same place
+            manifest.params["callback"] = callback
+
+    chosen_idea = manifest.params.get("idea") if manifest else None
+    if not chosen_idea:
+        chosen_idea = generate_ad_idea(product_name, product_desc, idea_prompt)
+        if manifest:
+            manifest.params["idea"] = chosen_idea
+            manifest.save()
 
     # Agents: no LLM objects needed because tools call Bedrock directly
     planner = planning_agent()
@@ -38,7 +105,8 @@ def run(product_name, product_desc,current_run_id):
     prompts = {"script": script_prompt, "rubric": eval_rubric}
 
     result = run_pipeline(planner, s_agent, e_agent, i_agent, v_agent, a_agent, ed_agent,
-                          prompts, product_name, product_desc, chosen_idea,current_run_id)
+                          prompts, product_name, product_desc, chosen_idea,current_run_id,
+                          manifest=manifest)
     result["idea_used"] = chosen_idea
     print("Pipeline result:", result)
 
@@ -1,9 +1,16 @@
 # dynamo_status.py
-import os, boto3
+# Status writes are buffered per run and flushed as one update_item (write-behind):
+# every STATUS_FLUSH_SECS, and immediately for terminal states (FAILED, final
+# video path, editing COMPLETED). STATUS_WRITE_BEHIND=0 writes through.
+import os, atexit, threading, time, boto3
+from botocore.exceptions import ClientError
+from decimal import Decimal
 from enum import Enum
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
+from app.events import event_bus
+
 load_dotenv()
 AWS_REGION = os.getenv("AWS_REGION")
 DDB_TABLE  = os.getenv("DDB_TABLE")   # your table with PK: id
@@ -11,6 +18,9 @@ DDB_TABLE  = os.getenv("DDB_TABLE")   # your table with PK: id
 dynamodb = boto3.resource("dynamodb", region_name=AWS_REGION)
 table = dynamodb.Table(name=DDB_TABLE)
 
+STATUS_WRITE_BEHIND = os.getenv("STATUS_WRITE_BEHIND", "1") == "1"
+STATUS_FLUSH_SECS = float(os.getenv("STATUS_FLUSH_SECS", "1.0"))
+
 class StepName(str, Enum):
     final_video_path = "final_video_path"
     script_generation_status = "script_generation_status"
@@ -31,11 +41,12 @@ STEP_ATTR = {
 def _now():
     return datetime.now(timezone.utc).isoformat()
 
-def ensure_row(run_id: str):
-    """Create the row if missing so polling works from the start."""
-    item = table.get_item(Key={"run_id": run_id}).get("Item")
-    if item: 
-        return
+def create_row(run_id: str) -> bool:
+    """
+    Seed the row once at submission so polling works from the start.
+    Conditional put: an existing row (resubmitted run_id, or a worker that
+    already wrote) is left alone. Returns True if the row was created.
+    """
     seed = {
         "run_id": run_id,
         "script_generation_status": "PENDING",
@@ -46,29 +57,211 @@ def ensure_row(run_id: str):
         "final_video_path": None,
         "updated_at": _now(),
     }
-    table.put_item(Item=seed)
+    try:
+        table.put_item(Item=seed, ConditionExpression="attribute_not_exists(run_id)")
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
 
-def update_status(run_id: str, step: StepName, status: str):
-    """
-    Update a single step status. status ∈ {"pending","running","completed","failed"}.
-    """
-    ensure_row(run_id)
-    attr = STEP_ATTR[step]
+def ensure_row(run_id: str):
+    """Kept for callers of the old API; update_status no longer needs it."""
+    create_row(run_id)
+
+
+# ---------- write-behind buffer ----------
+_pending = {}                   # run_id -> {attr: value, "updated_at": iso}
+_pending_lock = threading.Lock()
+# Striped by run_id: a run's writes always take the same lock, and the set stays fixed in size
+_RUN_LOCK_STRIPES = 64
+_run_locks = [threading.Lock() for _ in range(_RUN_LOCK_STRIPES)]
+_flusher = None
+
+def _is_terminal(step: StepName, status) -> bool:
+    if step == StepName.final_video_path:
+        return True
+    text = str(status or "").upper()
+    return text.startswith("FAILED") or (step == StepName.editing_status and text == "COMPLETED")
+
+def _run_lock(run_id: str) -> threading.Lock:
+    return _run_locks[hash(run_id) % _RUN_LOCK_STRIPES]
+
+def _write(run_id: str, values: dict, return_values: bool = False):
+    names, vals, sets = {}, {}, []
+    for i, (attr, val) in enumerate(values.items()):
+        names[f"#a{i}"] = attr
+        vals[f":v{i}"] = val
+        sets.append(f"#a{i} = :v{i}")
+    kwargs = {"ReturnValues": "ALL_NEW"} if return_values else {}
+    # update_item upserts, so no read is needed to make sure the row exists
     resp = table.update_item(
         Key={"run_id": run_id},
-        UpdateExpression="SET #a = :val, #u = :now",
-        ExpressionAttributeNames={"#a": attr, "#u": "updated_at"},
-        ExpressionAttributeValues={":val": status, ":now": _now()},
-        ReturnValues="ALL_NEW",
+        UpdateExpression="SET " + ", ".join(sets),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=vals,
+        **kwargs,
     )
-    return resp["Attributes"]
+    return resp.get("Attributes") if return_values else None
 
-def get_status(run_id: str):
-    """Fetch the consolidated row for UI."""
+def _flush_run(run_id: str, return_values: bool = False):
+    # Writes for one run are serialized so an older batch can't land after a newer one
+    with _run_lock(run_id):
+        with _pending_lock:
+            values = _pending.pop(run_id, None)
+        if not values:
+            return None
+        try:
+            return _write(run_id, values, return_values)
+        except Exception:
+            with _pending_lock:
+                newer = _pending.setdefault(run_id, {})
+                for attr, val in values.items():
+                    newer.setdefault(attr, val)
+            raise
+
+def flush_status(run_id: str = None) -> None:
+    """Write buffered updates now (one run, or all). Failed writes stay buffered."""
+    with _pending_lock:
+        run_ids = [run_id] if run_id else list(_pending)
+    for rid in run_ids:
+        try:
+            _flush_run(rid)
+        except Exception as exc:
+            print(f"[status] flush failed for {rid}: {exc}")
+
+def _flush_loop():
+    while True:
+        time.sleep(STATUS_FLUSH_SECS)
+        flush_status()
+
+def _ensure_flusher():
+    global _flusher
+    with _pending_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="status-flush", daemon=True)
+            _flusher.start()
+            atexit.register(flush_status)
+
+def update_status(run_id: str, step: StepName, status: str, return_values: bool = False):
+    """
+    Update a single step status. status ∈ {"pending","running","completed","failed"}.
+    Buffered unless STATUS_WRITE_BEHIND=0, the status is terminal or the
+    caller asks for the updated row (return_values=True returns it).
+    """
+    _buffer(run_id, STEP_ATTR[step], status)
+    if return_values or not STATUS_WRITE_BEHIND or _is_terminal(step, status):
+        return _flush_run(run_id, return_values)
+    _ensure_flusher()
+    return None
+
+def update_progress(run_id: str, progress: dict) -> None:
+    """Buffered write of the compact per-scene progress map (see app/progress.py)."""
+    _buffer(run_id, "progress", progress)
+    if not STATUS_WRITE_BEHIND:
+        _flush_run(run_id)
+        return
+    _ensure_flusher()
+
+def _buffer(run_id: str, attr: str, value) -> None:
+    now = _now()
+    with _pending_lock:
+        batch = _pending.setdefault(run_id, {})
+        batch[attr] = value
+        batch["updated_at"] = now
+    # SSE watchers in this process hear about it before the row is written
+    event_bus.publish(run_id, {attr: value, "updated_at": now})
+
+
+# ---------- stage duration history (for progress ETAs) ----------
+# Kept in the runs table under a reserved key: '#' never appears in a run_id
+# (GenerateAdRequest rejects it), and get_status_item hides META_KEY_PREFIX rows.
+META_KEY_PREFIX = "meta#"
+STAGE_STATS_ID = f"{META_KEY_PREFIX}stage_durations"
+STAGE_STATS_RETRIES = 5
+
+def _read_stage_stats():
+    item = table.get_item(Key={"run_id": STAGE_STATS_ID}, ConsistentRead=True).get("Item") or {}
+    durations = {k: float(v) for k, v in (item.get("durations") or {}).items()}
+    return durations, item.get("version")
+
+def load_stage_stats() -> dict:
+    """EWMA seconds per stage kind, from earlier runs."""
+    return _read_stage_stats()[0]
+
+def update_stage_stats(merge) -> dict:
+    """
+    Read-modify-write of the history with optimistic locking: merge(stored)
+    returns the new durations and the put only lands if nobody else wrote
+    in between (version attribute); otherwise it is re-read and re-merged.
+    """
+    for _ in range(STAGE_STATS_RETRIES):
+        stored, version = _read_stage_stats()
+        durations = merge(dict(stored))
+        if version is None:
+            condition, values = "attribute_not_exists(run_id)", None
+        else:
+            condition, values = "version = :v", {":v": version}
+        try:
+            table.put_item(
+                Item={
+                    "run_id": STAGE_STATS_ID,
+                    "durations": {k: Decimal(str(round(v, 1))) for k, v in durations.items()},
+                    "version": (version or 0) + 1,
+                    "updated_at": _now(),
+                },
+                ConditionExpression=condition,
+                **({"ExpressionAttributeValues": values} if values else {}),
+            )
+            return durations
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+    raise RuntimeError(f"stage history still contended after {STAGE_STATS_RETRIES} attempts")
+
+_SCENE_STATE = {".": "pending", "r": "running", "d": "done", "f": "failed"}
+
+def _decode_progress(raw):
+    if not raw:
+        return None
+    at = int(raw.get("at", 0))
+    eta = max(0, int(raw.get("e", 0)) - max(0, int(time.time()) - at)) if at else int(raw.get("e", 0))
+    return {
+        "percent": int(raw.get("p", 0)),
+        "eta_seconds": eta,
+        "poll_after_seconds": int(raw.get("poll", 0)),
+        "scenes": [
+            {"scene": i, **{kind: _SCENE_STATE.get(code, "pending") for kind, code in zip(("image", "video", "audio"), flags)}}
+            for i, flags in enumerate(raw.get("s") or [], start=1)
+        ],
+    }
+
+
+def get_status_item(run_id: str):
+    """Raw row, including updates still buffered in this process (they are newer than the table)."""
+    if run_id.startswith(META_KEY_PREFIX):
+        return None
     response = table.get_item(Key={"run_id": run_id})
     item = response.get("Item")
-    if not item:
+    with _pending_lock:
+        buffered = dict(_pending.get(run_id, {}))
+    if not item and not buffered:
         return None
+    return {"run_id": run_id, **(item or {}), **buffered}
+
+def get_status(run_id: str):
+    """Fetch the consolidated row for UI."""
+    item = get_status_item(run_id)
+    return format_status(item) if item else None
+
+def is_finished(status: dict) -> bool:
+    """True once a consolidated status can no longer change (completed or failed)."""
+    steps = [v for k, v in status.items() if k.endswith("_status")]
+    if any(str(v).upper().startswith("FAILED") for v in steps):
+        return True
+    return status.get("editing_status") == "COMPLETED" and bool(status.get("final_video_uri"))
+
+def format_status(item: dict) -> dict:
     return {
         'id': item['run_id'],
         'script_generation_status': item.get('script_generation_status', 'PENDING'),
@@ -77,7 +270,8 @@ def get_status(run_id: str):
         'audio_generation_status': item.get('audio_generation_status', 'PENDING'),
         'editing_status': item.get('editing_status', 'PENDING'),
         'updated_at': item['updated_at'],
-        'final_video_uri': item.get('final_video_path')
+        'final_video_uri': item.get('final_video_path'),
+        'progress': _decode_progress(item.get('progress')),
     }
 
 # def add_final_video_uri(run_id: str, video_uri: str):
@@ -0,0 +1,104 @@
+# app/events.py
+# ------------------------------------------------------------
+# In-process pub/sub for run status transitions.
+#
+# dynamo_status publishes every status/progress change it buffers; the SSE
+# endpoint (GET /runs/{run_id}/events) subscribes per connection. Pipelines
+# running in another process (JOB_WORKER_MODE=process, other hosts) never
+# reach this bus, so a RunPoller also re-reads the status row periodically:
+# one read per watched run, published to every subscriber of that run.
+# ------------------------------------------------------------
+
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class EventBus:
+    """Thread-safe fan-out from pipeline threads to asyncio subscribers."""
+
+    def __init__(self):
+        self._subs: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, run_id: str) -> asyncio.Queue:
+        """Call from a coroutine; the queue receives dicts of changed row attributes."""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subs[run_id].append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, run_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = [s for s in self._subs.get(run_id, []) if s[1] is not queue]
+            if subs:
+                self._subs[run_id] = subs
+            else:
+                self._subs.pop(run_id, None)
+
+    def publish(self, run_id: str, changes: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs.get(run_id, ()))
+            self.published += 1
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, dict(changes))
+            except RuntimeError:
+                pass   # subscriber's loop already closed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "runs_watched": len(self._subs),
+                "subscribers": sum(len(v) for v in self._subs.values()),
+                "published": self.published,
+            }
+
+
+class RunPoller:
+    """
+    Periodic fetch(run_id) for runs with at least one watcher; changed rows are
+    published on the bus. Call acquire/release from coroutines on one loop.
+    """
+
+    def __init__(self, bus: EventBus, fetch: Callable[[str], Optional[Dict[str, Any]]], interval: float):
+        self.bus = bus
+        self.fetch = fetch
+        self.interval = interval
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._watchers: Dict[str, int] = defaultdict(int)
+
+    def acquire(self, run_id: str) -> None:
+        self._watchers[run_id] += 1
+        if run_id not in self._tasks:
+            self._tasks[run_id] = asyncio.get_running_loop().create_task(self._poll(run_id))
+
+    def release(self, run_id: str) -> None:
+        self._watchers[run_id] -= 1
+        if self._watchers[run_id] <= 0:
+            self._watchers.pop(run_id, None)
+            task = self._tasks.pop(run_id, None)
+            if task is not None:
+                task.cancel()
+
+    async def _poll(self, run_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        last = None
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                item = await loop.run_in_executor(None, self.fetch, run_id)
+            except Exception as exc:
+                print(f"[events] status poll failed for {run_id}: {exc}")
+                continue
+            if item and item != last:
+                last = item
+                self.bus.publish(run_id, item)
+
+    def stats(self) -> Dict[str, int]:
+        return {"polled_runs": len(self._tasks)}
+
+
+event_bus = EventBus()
@@ -0,0 +1,428 @@
+# app/job_queue.py
+# ------------------------------------------------------------
+# Job queue + worker pool for generation runs.
+#
+# The web server only enqueues; a fixed pool of workers (threads or
+# processes) drains the queue. That bounds how many pipelines run at once,
+# keeps /runs/{id}/status responsive under bursts of /generate-ad, and with
+# the SQLite backend, jobs that were queued or running survive a restart.
+#
+# Backends:
+#   memory  – in-process deque (default; lost on restart)
+#   sqlite  – local file (JOB_QUEUE_PATH); interrupted jobs are re-queued.
+#             Several processes may share the file: each claimed job records
+#             its owner and a heartbeat, and only jobs whose owner is gone
+#             (or has stopped heartbeating) are re-queued.
+# ------------------------------------------------------------
+
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "memory").lower()   # memory | sqlite
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "crew_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "thread").lower()       # thread | process
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "20"))
+# SQLite backend: running jobs heartbeat this often; a job whose owner missed
+# JOB_STALE_SECS of heartbeats is considered orphaned and re-queued
+JOB_HEARTBEAT_SECS = float(os.getenv("JOB_HEARTBEAT_SECS", "15"))
+JOB_STALE_SECS = float(os.getenv("JOB_STALE_SECS", "120"))
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when admission control rejects a job."""
+
+
+class JobActiveError(RuntimeError):
+    """Raised by JobQueue.submit(exclusive=True) when the run already has a queued or running job."""
+
+
+class Job:
+    def __init__(self, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None,
+                 enqueued_at: Optional[float] = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.kind = kind
+        self.payload = payload
+        self.enqueued_at = enqueued_at or time.time()
+
+    def __repr__(self):
+        return f"Job({self.kind!r}, id={self.id!r})"
+
+
+# ---------- Backends ----------
+def _check_depth(depth: int, max_depth: Optional[int]) -> None:
+    """Called by backends under their own lock, so the check and the insert are atomic."""
+    if max_depth is not None and depth >= max_depth:
+        raise QueueFullError(f"Job queue is full ({depth}/{max_depth} waiting)")
+
+
+def _check_exclusive(active: bool, run_id: Optional[str]) -> None:
+    if active:
+        raise JobActiveError(f"Run '{run_id}' already has a queued or running job")
+
+
+class InMemoryBackend:
+    """FIFO in process memory. Fast, but queued jobs are lost on restart."""
+
+    def __init__(self):
+        self._items: deque = deque()
+        self._running: Dict[str, Job] = {}
+        self._cv = threading.Condition()
+
+    def put(self, job: Job, max_depth: Optional[int] = None, exclusive: bool = False) -> None:
+        with self._cv:
+            _check_depth(len(self._items), max_depth)
+            if exclusive:
+                _check_exclusive(self._active(job.payload.get("run_id")), job.payload.get("run_id"))
+            self._items.append(job)
+            self._cv.notify()
+
+    def get(self, timeout: float) -> Optional[Job]:
+        with self._cv:
+            if not self._items:
+                self._cv.wait(timeout)
+            if not self._items:
+                return None
+            job = self._items.popleft()
+            self._running[job.id] = job
+            return job
+
+    def done(self, job: Job, ok: bool) -> None:
+        with self._cv:
+            self._running.pop(job.id, None)
+
+    def is_active(self, run_id: str) -> bool:
+        with self._cv:
+            return self._active(run_id)
+
+    def _active(self, run_id: Optional[str]) -> bool:
+        jobs = list(self._items) + list(self._running.values())
+        return any(j.payload.get("run_id") == run_id for j in jobs)
+
+    def depth(self) -> int:
+        with self._cv:
+            return len(self._items)
+
+    def recover(self) -> int:
+        return 0
+
+
+def _boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # exists, owned by another user
+    return True
+
+
+class SQLiteBackend:
+    """
+    Durable local stand-in for a managed queue. A job is claimed by flipping
+    its state to 'running' and recording the claiming process as its owner
+    ("host:boot_id:pid"); a background thread refreshes the heartbeat of the
+    jobs this process owns. recover() puts orphaned jobs back to 'queued' so
+    they are picked up again: jobs of a dead process on this host (or of an
+    earlier boot), and jobs anywhere whose heartbeat is older than stale_secs.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, poll_secs: float = 0.5,
+                 heartbeat_secs: float = JOB_HEARTBEAT_SECS, stale_secs: float = JOB_STALE_SECS):
+        self.path = path
+        self.poll_secs = poll_secs
+        self.heartbeat_secs = heartbeat_secs
+        self.stale_secs = max(stale_secs, 2 * heartbeat_secs)
+        self.host, self.boot_id, self.pid = socket.gethostname(), _boot_id(), os.getpid()
+        self.owner = f"{self.host}:{self.boot_id}:{self.pid}"
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   id TEXT PRIMARY KEY,
+                   kind TEXT NOT NULL,
+                   payload TEXT NOT NULL,
+                   state TEXT NOT NULL,
+                   enqueued_at REAL NOT NULL,
+                   started_at REAL,
+                   finished_at REAL
+               )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, decl in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {decl}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, enqueued_at)")
+
+    def put(self, job: Job, max_depth: Optional[int] = None, exclusive: bool = False) -> None:
+        # Check and insert in one write transaction, so concurrent submits (even
+        # from other processes sharing the file) can't overshoot max_depth
+        # or queue a run twice
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_depth is not None:
+                    _check_depth(self._conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0], max_depth)
+                if exclusive:
+                    _check_exclusive(self._active(job.payload.get("run_id")), job.payload.get("run_id"))
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, state, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+                    (job.id, job.kind, json.dumps(job.payload), job.enqueued_at),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._wake.set()
+
+    def _claim(self) -> Optional[Job]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, enqueued_at FROM jobs "
+                    "WHERE state = 'queued' ORDER BY enqueued_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'running', started_at = ?, owner = ?, heartbeat = ? WHERE id = ?",
+                        (now, self.owner, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return Job(row[1], json.loads(row[2]), job_id=row[0], enqueued_at=row[3])
+
+    def get(self, timeout: float) -> Optional[Job]:
+        deadline = time.time() + timeout
+        while True:
+            job = self._claim()
+            if job or time.time() >= deadline:
+                return job
+            self._wake.wait(min(self.poll_secs, max(0.0, deadline - time.time())))
+            self._wake.clear()
+
+    def done(self, job: Job, ok: bool) -> None:
+        with self._lock:
+            # owner check: a job re-queued as stale and claimed elsewhere isn't ours to close
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ? WHERE id = ? AND owner = ?",
+                ("done" if ok else "failed", time.time(), job.id, self.owner),
+            )
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def is_active(self, run_id: str) -> bool:
+        with self._lock:
+            return self._active(run_id)
+
+    def _active(self, run_id: Optional[str]) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM jobs WHERE state IN ('queued', 'running') "
+            "AND json_extract(payload, '$.run_id') = ? LIMIT 1",
+            (run_id,),
+        ).fetchone() is not None
+
+    def recover(self) -> int:
+        """
+        Re-queue orphaned running jobs (see the class docstring) and start the
+        heartbeat thread, which keeps recovering stale jobs while this process
+        lives. Generation jobs come back as 'resume' so they continue from the
+        run's manifest.
+        """
+        if self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+        return self._requeue_orphans()
+
+    def _orphaned(self, owner: Optional[str], heartbeat: Optional[float], now: float) -> bool:
+        if owner == self.owner:
+            return False
+        host, _, rest = (owner or "").partition(":")
+        boot_id, _, pid = rest.rpartition(":")
+        if host == self.host and boot_id == self.boot_id and pid.isdigit() and os.name == "posix":
+            return not _pid_alive(int(pid))
+        if host == self.host and boot_id != self.boot_id:
+            return True   # claimed before this machine rebooted
+        return heartbeat is None or now - heartbeat > self.stale_secs
+
+    def _requeue_orphans(self) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                rows = self._conn.execute(
+                    "SELECT id, owner, heartbeat FROM jobs WHERE state = 'running'"
+                ).fetchall()
+                orphans = [job_id for job_id, owner, heartbeat in rows if self._orphaned(owner, heartbeat, now)]
+                for job_id in orphans:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'queued', started_at = NULL, owner = NULL, heartbeat = NULL, "
+                        "kind = CASE WHEN kind = 'generate' THEN 'resume' ELSE kind END "
+                        "WHERE id = ?",
+                        (job_id,),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if orphans:
+            self._wake.set()
+        return len(orphans)
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_secs)
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE state = 'running' AND owner = ?",
+                        (time.time(), self.owner),
+                    )
+                recovered = self._requeue_orphans()
+                if recovered:
+                    print(f"[jobs] re-queued {recovered} job(s) whose owner stopped heartbeating")
+            except Exception as exc:
+                print(f"[jobs] heartbeat failed: {exc}")
+
+
+def make_backend(name: str = JOB_QUEUE_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "memory":
+        return InMemoryBackend()
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {name!r} (expected 'memory' or 'sqlite')")
+
+
+# ---------- Queue + workers ----------
+class JobQueue:
+    """
+    Bounded queue drained by `workers` dispatcher threads.
+
+    In 'process' mode each dispatcher hands its job to a ProcessPoolExecutor of
+    the same size, so heavy runs (ffmpeg, JSON parsing) don't share the web
+    server's GIL. Handlers must then be importable module-level functions.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[..., Any]], backend=None,
+                 workers: int = JOB_WORKERS, mode: str = JOB_WORKER_MODE,
+                 max_depth: int = JOB_QUEUE_MAX_DEPTH):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown JOB_WORKER_MODE: {mode!r} (expected 'thread' or 'process')")
+        self.handlers = dict(handlers)
+        self.backend = backend or make_backend()
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.max_depth = max_depth
+        self._running: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._procs: Optional[ProcessPoolExecutor] = None
+        self.completed = 0
+        self.failed = 0
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        recovered = self.backend.recover()
+        if recovered:
+            print(f"[jobs] re-queued {recovered} job(s) interrupted by a restart")
+        if self.mode == "process":
+            self._procs = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[jobs] started {self.workers} {self.mode} worker(s) on {type(self.backend).__name__}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        if self._procs is not None:
+            self._procs.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- producer side ----------
+    def submit(self, kind: str, payload: Dict[str, Any], exclusive: bool = False) -> Job:
+        """
+        With exclusive, reject (JobActiveError) a job whose payload run_id
+        already has a job queued or running, so one run never has two pipelines.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job = Job(kind, payload)
+        self.backend.put(job, max_depth=self.max_depth, exclusive=exclusive)
+        return job
+
+    def is_active(self, run_id: str) -> bool:
+        return self.backend.is_active(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._running)
+        return {
+            "backend": type(self.backend).__name__,
+            "mode": self.mode,
+            "workers": self.workers,
+            "queued": self.backend.depth(),
+            "running": running,
+            "max_depth": self.max_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    # ---------- consumer side ----------
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            job = self.backend.get(timeout=1.0)
+            if job is None:
+                continue
+            with self._lock:
+                self._running[job.id] = job
+            ok = False
+            try:
+                handler = self.handlers[job.kind]
+                if self._procs is not None:
+                    self._procs.submit(handler, **job.payload).result()
+                else:
+                    handler(**job.payload)
+                ok = True
+            except Exception as exc:
+                print(f"[jobs] {job} failed: {exc}")
+            finally:
+                with self._lock:
+                    self._running.pop(job.id, None)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                self.backend.done(job, ok)
@@ -1,13 +1,26 @@
 import os
+import json
 import uuid
+import asyncio
 import traceback
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, Body, HTTPException, Path, BackgroundTasks
+from fastapi import FastAPI, Body, HTTPException, Path, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
-from app.dynamo_status import get_status, update_status, StepName
-from app.crew import run
+from app.dynamo_status import (
+    create_row, flush_status, format_status, get_status, get_status_item, is_finished, update_status, StepName,
+)
+from app.events import RunPoller, event_bus
+from app.callbacks import callback_allowed, send_completion
+from app.crew import run, resume, load_manifest, edit_scene
+from app.job_queue import JOB_WORKER_MODE, JobActiveError, JobQueue, QueueFullError
+from app.tools.bedrock_clients import client_stats
+from app.tools.asset_cache import asset_cache_stats
+from app.tools.llm_cache import llm_cache_stats
 
 load_dotenv()
 
@@ -16,11 +29,40 @@ An API to generate marketing ad videos using a CrewAI-powered backend.
 Submit product details to kick off an asynchronous generation process and poll the status endpoint.
 """
 
+# Watched runs' status rows are re-read this often (once per run, however many
+# SSE clients watch it). Pipelines in worker processes don't publish to this
+# process's bus, so poll faster there.
+STATUS_EVENTS_POLL_SECS = float(os.getenv(
+    "STATUS_EVENTS_POLL_SECS", "2" if JOB_WORKER_MODE == "process" else "15"
+))
+STATUS_EVENTS_MAX_SECS = float(os.getenv("STATUS_EVENTS_MAX_SECS", "3600"))
+run_poller = RunPoller(event_bus, get_status_item, STATUS_EVENTS_POLL_SECS)
+
+# Generation runs are drained by a worker pool instead of the web server's threadpool.
+# Created in the lifespan so process workers importing this module don't start their own.
+job_queue: Optional[JobQueue] = None
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global job_queue
+    job_queue = JobQueue(handlers={
+        "generate": _run_generation_task,
+        "resume": _resume_generation_task,
+    })
+    job_queue.start()
+    try:
+        yield
+    finally:
+        job_queue.stop()
+
+
 app = FastAPI(
     title="CrewAI Video Generator API",
     description=description,
     version="1.1.0",
     contact={"name": "API Support", "email": "support@example.com"},
+    lifespan=lifespan,
 )
 
 # --- Pydantic Models ---
@@ -35,9 +77,20 @@ class GenerateAdRequest(BaseModel):
     )
     run_id: Optional[str] = Field(
         default=None,
+        pattern=r"^[^#]+$",
         description="A unique identifier for this generation job. Generated automatically when omitted.",
         example="sample-run-id-12345",
     )
+    callback_url: Optional[str] = Field(
+        default=None,
+        description="Receives one signed POST when the run completes or fails (see app/callbacks.py).",
+        example="https://api.example.com/ads/callbacks/crew",
+    )
+    callback_context: Optional[dict] = Field(
+        default=None,
+        description="Opaque JSON echoed back in the callback.",
+        example={"user_id": "user@example.com"},
+    )
 
 
 class GenerateAdResponse(BaseModel):
@@ -45,6 +98,36 @@ class GenerateAdResponse(BaseModel):
     status: str = Field(default="accepted", example="accepted")
     # MODIFICATION: Updated example to be more user-friendly.
     run_id: str = Field(description="A unique identifier for this generation job.", example="sample-run-id-12345")
+    queue_position: Optional[int] = Field(
+        default=None,
+        description="Jobs waiting ahead of this one when it was accepted.",
+        example=0,
+    )
+
+class QueueStatsResponse(BaseModel):
+    """Snapshot of the generation job queue."""
+    backend: str = Field(example="InMemoryBackend")
+    mode: str = Field(example="thread")
+    workers: int = Field(example=2)
+    queued: int = Field(example=3)
+    running: int = Field(example=2)
+    max_depth: int = Field(example=20)
+    completed: int = Field(example=41)
+    failed: int = Field(example=1)
+
+class SceneProgress(BaseModel):
+    """State of one scene's assets: pending, running, done or failed."""
+    scene: int = Field(example=2)
+    image: str = Field(example="done")
+    video: str = Field(description="The scene's Nova Reel job.", example="running")
+    audio: str = Field(example="done")
+
+class ProgressResponse(BaseModel):
+    """Fine-grained progress; clients should wait `poll_after_seconds` before polling again."""
+    percent: int = Field(example=62)
+    eta_seconds: int = Field(description="Estimated from earlier runs' stage durations.", example=210)
+    poll_after_seconds: int = Field(example=21)
+    scenes: List[SceneProgress] = Field(default_factory=list)
 
 class StatusResponse(BaseModel):
     """The response model for the status check endpoint."""
@@ -60,20 +143,111 @@ class StatusResponse(BaseModel):
         description="The final generated video URL. Will be populated once editing_status is 'completed'.",
         example="https://vi-gen-dev.s3.amazonaws.com/outputs/sample-run-id-12345/final_video.mp4"
     )
+    progress: Optional[ProgressResponse] = Field(
+        default=None,
+        description="Per-scene progress, percent complete and ETA. Absent for runs started before it existed.",
+    )
+
+class SceneEditRequest(BaseModel):
+    """Scene fields to change; omitted fields keep their current value."""
+    title: Optional[str] = Field(default=None, example="Unlock in a touch")
+    visual_description: Optional[str] = Field(
+        default=None, example="Close-up of a thumb pressing the lock's sensor at dusk."
+    )
+    camera_directions: Optional[str] = Field(default=None, example="Slow push-in, shallow depth of field.")
+    dialogue: Optional[str] = Field(default=None, example="One touch. You're home.")
+    mood: Optional[str] = Field(default=None, example="warm")
+    visual_style: Optional[str] = Field(default=None, example="cinematic")
+    hook: Optional[str] = Field(default=None)
+
+class SceneEditResponse(GenerateAdResponse):
+    """Stages that will be re-run and the ones reused from the previous render."""
+    regenerate: list = Field(default_factory=list, example=["image_2", "video_2", "render"])
+    reused: list = Field(default_factory=list, example=["image_1", "video_1", "audio_1", "audio_2"])
 
 class ErrorResponse(BaseModel):
     detail: str = Field(example="A specific error message.")
 
-def _run_generation_task(product_name: str, product_desc: str, run_id: str) -> None:
-    """Kick off the heavy pipeline and ensure status is updated on failures."""
+def _notify(run_id: str, callback: Optional[dict], result: Optional[dict] = None,
+            error: Optional[BaseException] = None) -> None:
+    """Completion webhook for runs submitted with a callback_url."""
+    if not callback:
+        return
+    flush_status(run_id)
+    try:
+        crew_status = get_status(run_id)
+    except Exception as status_err:
+        print(f"Failed to read status for the {run_id} callback: {status_err}")
+        crew_status = None
+    send_completion(
+        callback, run_id,
+        "FAILED" if error is not None else "COMPLETED",
+        final_video_uri=(result or {}).get("final_video_uri"),
+        error=str(error) if error is not None else None,
+        crew_status=crew_status,
+    )
+
+
+def _run_generation_task(product_name: str, product_desc: str, run_id: str,
+                         callback: Optional[dict] = None) -> None:
+    """Kick off the heavy pipeline; failures are recorded in the status row, then re-raised."""
+    result, error = None, None
+    try:
+        result = run(product_name=product_name, product_desc=product_desc, current_run_id=run_id,
+                     callback=callback)
+    except Exception as exc:
+        error = exc
+        traceback.print_exc()
+        try:
+            update_status(run_id, StepName.editing_status, f"FAILED: {exc}")
+        except Exception as status_err:
+            print(f"Failed to record failure status for {run_id}: {status_err}")
+    finally:
+        # Process workers exit without atexit hooks; don't leave updates buffered
+        flush_status(run_id)
+    _notify(run_id, callback, result, error)
+    if error is not None:
+        raise error   # so the job queue records the job as failed
+
+
+def _resume_generation_task(run_id: str, product_name: Optional[str] = None,
+                            product_desc: Optional[str] = None, callback: Optional[dict] = None) -> None:
+    """
+    Resume a run from its manifest, recording failures like a fresh run.
+    Jobs re-queued after a restart may have died before writing a manifest;
+    those start over when the product details are known.
+    """
+    result, error = None, None
     try:
-        run(product_name=product_name, product_desc=product_desc, current_run_id=run_id)
+        manifest = load_manifest(run_id)
+        if manifest is not None:
+            callback = manifest.params.get("callback") or callback
+            result = resume(current_run_id=run_id, manifest=manifest)
+        elif product_name is None:
+            raise LookupError(f"No manifest found for run {run_id}")
+        else:
+            result = run(product_name=product_name, product_desc=product_desc, current_run_id=run_id,
+                         callback=callback)
     except Exception as exc:
+        error = exc
         traceback.print_exc()
         try:
             update_status(run_id, StepName.editing_status, f"FAILED: {exc}")
         except Exception as status_err:
             print(f"Failed to record failure status for {run_id}: {status_err}")
+    finally:
+        # Process workers exit without atexit hooks; don't leave updates buffered
+        flush_status(run_id)
+    _notify(run_id, callback, result, error)
+    if error is not None:
+        raise error   # so the job queue records the job as failed
+
+
+def _run_in_progress(run_id: str, item: Optional[dict]) -> bool:
+    """A step is RUNNING, or a job for the run is queued or running on this queue."""
+    if item and any(v == "RUNNING" for k, v in item.items() if k.endswith("_status")):
+        return True
+    return job_queue.is_active(run_id)
 
 
 # --- API Endpoints ---
@@ -83,19 +257,114 @@ def _run_generation_task(product_name: str, product_desc: str, run_id: str) -> N
     tags=["Ad Generation"],
     summary="Kick off an asynchronous ad video generation task",
     response_model=GenerateAdResponse,
+    responses={409: {"model": ErrorResponse}, 422: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
 )
-def generate_ad(payload: GenerateAdRequest, background_tasks: BackgroundTasks):
+def generate_ad(payload: GenerateAdRequest):
     """
-    Accepts product details and starts an asynchronous workflow.
+    Accepts product details and queues an asynchronous workflow.
     This endpoint returns a `run_id` immediately, which is used to poll the status.
+    Returns 503 when the job queue is full.
     """
+    if payload.callback_url and not callback_allowed(payload.callback_url):
+        raise HTTPException(status_code=422, detail="callback_url is not an allowed callback target.")
     try:
         run_id = payload.run_id or str(uuid.uuid4())
-        background_tasks.add_task(_run_generation_task, payload.name, payload.desc, run_id)
-        return {"status": "accepted", "run_id": run_id}
-        
+        position = job_queue.backend.depth()
+        job = {
+            "product_name": payload.name,
+            "product_desc": payload.desc,
+            "run_id": run_id,
+        }
+        if payload.callback_url:
+            job["callback"] = {"url": payload.callback_url, "context": payload.callback_context}
+        job_queue.submit("generate", job, exclusive=True)
+        try:
+            create_row(run_id)
+        except Exception as status_err:
+            print(f"Failed to create status row for {run_id}: {status_err}")
+        return {"status": "accepted", "run_id": run_id, "queue_position": position}
+    except JobActiveError:
+        raise HTTPException(status_code=409, detail=f"Run '{run_id}' is already queued or running.")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start the background task: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue the generation job: {e}")
+
+@app.post(
+    "/runs/{run_id}/resume",
+    tags=["Ad Generation"],
+    summary="Resume a failed or interrupted run from its checkpoint manifest",
+    response_model=GenerateAdResponse,
+    responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+)
+def resume_run(run_id: str = Path(..., example="sample-run-id-12345")):
+    """
+    Re-runs only the stages that have not finished yet, reusing the script,
+    evaluation and scene assets recorded in `outputs/<run_id>/manifest.json`.
+    """
+    try:
+        manifest = load_manifest(run_id)
+        if manifest is None:
+            raise HTTPException(status_code=404, detail=f"No checkpoint manifest for run '{run_id}'.")
+        item = get_status(run_id)
+        # A scene edit drops the render checkpoint, so an edited run can be resumed again
+        if item and item.get("final_video_uri") and manifest.is_done("render"):
+            raise HTTPException(status_code=409, detail=f"Run '{run_id}' already completed.")
+        if _run_in_progress(run_id, item):
+            raise HTTPException(status_code=409, detail=f"Run '{run_id}' is still in progress.")
+        position = job_queue.backend.depth()
+        job_queue.submit("resume", {"run_id": run_id}, exclusive=True)
+        return {"status": "accepted", "run_id": run_id, "queue_position": position}
+    except HTTPException:
+        raise
+    except JobActiveError:
+        raise HTTPException(status_code=409, detail=f"Run '{run_id}' is still in progress.")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to resume run: {e}")
+
+@app.patch(
+    "/runs/{run_id}/scenes/{scene_id}",
+    tags=["Ad Generation"],
+    summary="Edit one scene and re-render only what it affects",
+    response_model=SceneEditResponse,
+    responses={404: {"model": ErrorResponse}, 409: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+)
+def edit_run_scene(
+    payload: SceneEditRequest,
+    run_id: str = Path(..., example="sample-run-id-12345"),
+    scene_id: str = Path(..., example="2"),
+):
+    """
+    Updates the scene in the run's approved script and queues a resume. Only
+    the assets whose inputs changed (keyframe, clip, voice-over) are
+    regenerated; the final video is rendered again from the rest.
+    """
+    changes = payload.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=422, detail="No scene fields to change.")
+    try:
+        if _run_in_progress(run_id, get_status(run_id)):
+            raise HTTPException(status_code=409, detail=f"Run '{run_id}' is still in progress.")
+        plan = edit_scene(run_id, scene_id, changes)
+        if not plan["regenerate"]:
+            return {"status": "unchanged", "run_id": run_id, **plan}
+        position = job_queue.backend.depth()
+        job_queue.submit("resume", {"run_id": run_id}, exclusive=True)
+        return {"status": "accepted", "run_id": run_id, "queue_position": position, **plan}
+    except HTTPException:
+        raise
+    except JobActiveError:
+        raise HTTPException(status_code=409, detail=f"Run '{run_id}' is still in progress.")
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to edit scene: {e}")
 
 @app.get(
     "/runs/{run_id}/status",
@@ -104,26 +373,103 @@ def generate_ad(payload: GenerateAdRequest, background_tasks: BackgroundTasks):
     response_model=StatusResponse,
 )
 # MODIFICATION: Updated example to be consistent.
-def get_run_status(run_id: str = Path(..., example="sample-run-id-12345")):
+def get_run_status(response: Response, run_id: str = Path(..., example="sample-run-id-12345")):
     """
     Fetches the consolidated status. Poll this endpoint until `editing_status`
-    is 'completed' and `final_video_uri` is populated.
+    is 'completed' and `final_video_uri` is populated. While the run is in
+    progress, `Retry-After` carries the suggested poll interval.
     """
     try:
         item = get_status(run_id)
         if not item:
             raise HTTPException(status_code=404, detail=f"Run with ID '{run_id}' not found.")
+        poll_after = (item.get("progress") or {}).get("poll_after_seconds")
+        if poll_after:
+            response.headers["Retry-After"] = str(poll_after)
         return item
     except HTTPException:
         raise  # Re-raise HTTPExceptions (like 404) as-is
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+def _sse(event: str, data: dict, event_id: int) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _status_events(request: Request, run_id: str, item: dict):
+    """
+    'status' events carry the same body as GET /runs/{run_id}/status and are
+    sent whenever it changes; 'end' follows the final one. Comment lines keep
+    idle connections open.
+    """
+    queue = event_bus.subscribe(run_id)
+    run_poller.acquire(run_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_EVENTS_MAX_SECS
+    last, seq = None, 0
+    try:
+        while True:
+            if await request.is_disconnected():
+                return
+            status = format_status(item)
+            if status != last:
+                seq += 1
+                yield _sse("status", status, seq)
+                last = status
+            if is_finished(status) or loop.time() > deadline:
+                seq += 1
+                yield _sse("end", {"id": run_id, "finished": is_finished(status)}, seq)
+                return
+            try:
+                changes = await asyncio.wait_for(queue.get(), timeout=STATUS_EVENTS_POLL_SECS)
+                while not queue.empty():
+                    changes.update(queue.get_nowait())
+                item = {**item, **changes}
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        run_poller.release(run_id)
+        event_bus.unsubscribe(run_id, queue)
+
+@app.get(
+    "/runs/{run_id}/events",
+    tags=["Status Tracking"],
+    summary="Stream status changes of a run (Server-Sent Events)",
+    responses={200: {"content": {"text/event-stream": {}}}, 404: {"model": ErrorResponse}},
+)
+async def stream_run_events(request: Request, run_id: str = Path(..., example="sample-run-id-12345")):
+    """
+    Pushes a `status` event (same body as `/runs/{run_id}/status`) on every
+    transition and closes with an `end` event once the run completed or
+    failed. One connection replaces polling the status endpoint.
+    """
+    try:
+        item = await run_in_threadpool(get_status_item, run_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not item:
+        raise HTTPException(status_code=404, detail=f"Run with ID '{run_id}' not found.")
+    return StreamingResponse(
+        _status_events(request, run_id, item),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get(
+    "/queue",
+    tags=["Status Tracking"],
+    summary="Job queue depth and worker utilisation",
+    response_model=QueueStatsResponse,
+)
+def get_queue_stats():
+    return job_queue.stats()
+
 @app.get("/", tags=["General"], include_in_schema=False)
 def root():
     return {"message": "CrewAI Ad Video Generator API is running 🚀"}
 
 @app.get("/health", tags=["General"], include_in_schema=False)
 def health():
-    return {"status": "healthy", "service": "crew-api"}
+    return {"status": "healthy", "service": "crew-api", "aws_clients": client_stats(),
+            "asset_caches": asset_cache_stats(), "llm_cache": llm_cache_stats(), "events": {**event_bus.stats(), **run_poller.stats()}}
 
@@ -0,0 +1,112 @@
+# app/manifest.py
+# ------------------------------------------------------------
+# Per-run checkpoint manifest stored next to the run artifacts:
+#   s3://<bucket>/outputs/<RUN_ID>/manifest.json
+#
+# It keeps the run inputs (product, description, chosen idea) and the
+# outputs of every finished pipeline stage (script, eval, scene image /
+# video / audio keys, concat outputs...). A resumed run hands the manifest
+# to the stage scheduler as its checkpoint, so finished stages are skipped.
+# ------------------------------------------------------------
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from .tools.bedrock_clients import get_json_s3, put_json_s3
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def manifest_key(run_prefix: str) -> str:
+    return f"{run_prefix.rstrip('/')}/{MANIFEST_NAME}"
+
+
+class RunManifest:
+    """Checkpoint for StageScheduler, persisted to S3 after every finished stage."""
+
+    def __init__(self, bucket: str, run_prefix: str, run_id: str,
+                 params: Optional[Dict[str, Any]] = None,
+                 stages: Optional[Dict[str, Dict[str, Any]]] = None,
+                 created_at: Optional[str] = None):
+        self.bucket = bucket
+        self.run_prefix = run_prefix.rstrip("/")
+        self.run_id = run_id
+        self.params: Dict[str, Any] = dict(params or {})
+        self.stages: Dict[str, Dict[str, Any]] = dict(stages or {})
+        self.created_at = created_at or _now()
+        self._lock = threading.Lock()
+
+    # ---------- persistence ----------
+    @property
+    def key(self) -> str:
+        return manifest_key(self.run_prefix)
+
+    @classmethod
+    def load(cls, bucket: str, run_prefix: str) -> Optional["RunManifest"]:
+        """Return the stored manifest for a run, or None if the run never checkpointed."""
+        data = get_json_s3(bucket, manifest_key(run_prefix))
+        if not data:
+            return None
+        return cls(
+            bucket,
+            run_prefix,
+            data.get("run_id", ""),
+            params=data.get("params"),
+            stages=data.get("stages"),
+            created_at=data.get("created_at"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "params": self.params,
+            "stages": self.stages,
+            "created_at": self.created_at,
+            "updated_at": _now(),
+        }
+
+    def save(self) -> None:
+        with self._lock:
+            put_json_s3(self.bucket, self.key, self.to_dict())
+
+    # ---------- StageScheduler checkpoint protocol ----------
+    def restore(self, stage) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.stages.get(stage.name)
+            if not entry:
+                return None
+            outputs = entry.get("outputs", {})
+            if any(o not in outputs for o in stage.outputs):
+                return None
+            return {o: outputs[o] for o in stage.outputs}
+
+    def record(self, stage, outputs: Dict[str, Any]) -> None:
+        with self._lock:
+            self.stages[stage.name] = {"outputs": outputs, "finished_at": _now()}
+            # Written under the lock so an older snapshot can't land after a newer one
+            put_json_s3(self.bucket, self.key, self.to_dict())
+
+    # ---------- helpers ----------
+    def is_done(self, stage_name: str) -> bool:
+        return stage_name in self.stages
+
+    def outputs(self, stage_name: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stages.get(stage_name, {}).get("outputs", {}))
+
+    def set_outputs(self, stage_name: str, outputs: Dict[str, Any]) -> None:
+        """Overwrite some outputs of a stage (e.g. an edited script); not saved."""
+        with self._lock:
+            entry = self.stages.setdefault(stage_name, {"outputs": {}, "finished_at": _now()})
+            entry["outputs"] = {**entry.get("outputs", {}), **outputs}
+
+    def invalidate(self, stage_names) -> None:
+        """Forget stages so the next resume runs them again; not saved."""
+        with self._lock:
+            for name in stage_names:
+                self.stages.pop(name, None)
@@ -0,0 +1,153 @@
+# app/progress.py
+# ------------------------------------------------------------
+# Fine-grained run progress for the status row.
+#
+# RunProgress follows every scheduler stage and keeps a compact summary in
+# the DynamoDB item (attribute "progress", written through the status
+# write-behind buffer):
+#   p     percent complete (0-100)
+#   e     ETA in seconds, estimated at epoch second `at`
+#   poll  suggested client poll interval in seconds
+#   s     one 3-char string per scene: image, video (Nova Reel job), audio
+#         '.' pending  'r' running  'd' done  'f' failed
+# Expected stage durations are an EWMA of earlier runs (stored in the same
+# table under the reserved STAGE_STATS_ID key) and fall back to DEFAULT_DURATIONS.
+# ------------------------------------------------------------
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .dynamo_status import load_stage_stats, update_progress, update_stage_stats
+
+PROGRESS_EWMA_ALPHA = float(os.getenv("PROGRESS_EWMA_ALPHA", "0.3"))
+# Scene count assumed for the ETA until the script is approved
+PROGRESS_DEFAULT_SCENES = int(os.getenv("PROGRESS_DEFAULT_SCENES", "4"))
+PROGRESS_POLL_MIN_SECS = int(os.getenv("PROGRESS_POLL_MIN_SECS", "2"))
+PROGRESS_POLL_MAX_SECS = int(os.getenv("PROGRESS_POLL_MAX_SECS", "30"))
+
+# Seconds; the Reel job dominates a scene
+DEFAULT_DURATIONS = {"script": 40.0, "evaluate": 20.0, "image": 15.0, "video": 240.0, "audio": 4.0, "render": 30.0}
+SCENE_KINDS = ("image", "video", "audio")
+
+
+def stage_kind(name: str) -> str:
+    """image_3 -> image, render -> render"""
+    return name.split("_", 1)[0]
+
+
+def ewma(old: Optional[float], sample: float, alpha: float = PROGRESS_EWMA_ALPHA) -> float:
+    return sample if old is None else alpha * sample + (1 - alpha) * old
+
+
+class RunProgress:
+    """Scheduler hooks (stage_started/finished/failed) that publish RunProgress.snapshot()."""
+
+    def __init__(self, run_id: str, scheduler, scene_slots: int, durations: Optional[Dict[str, float]] = None):
+        self.run_id = run_id
+        self.scheduler = scheduler
+        self.scene_slots = max(1, scene_slots)
+        if durations is None:
+            try:
+                durations = load_stage_stats()
+            except Exception as exc:
+                print(f"[progress] stage history unavailable, using defaults: {exc}")
+                durations = {}
+        self.durations = {**DEFAULT_DURATIONS, **(durations or {})}
+        self._state: Dict[str, str] = {}
+        self._started: Dict[str, float] = {}
+        self._samples: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    # ---------- scheduler hooks ----------
+    def stage_started(self, stage) -> None:
+        self._set(stage.name, "r")
+
+    def stage_finished(self, stage) -> None:
+        # Restored, cache-hit and adopted stages finish in milliseconds; they'd drag the EWMA to 0
+        if (not stage.restored and not stage.cached and stage.duration is not None
+                and stage_kind(stage.name) in self.durations):
+            with self._lock:
+                self._samples.setdefault(stage_kind(stage.name), []).append(stage.duration)
+        self._set(stage.name, "d")
+
+    def stage_failed(self, stage, exc: BaseException) -> None:
+        self._set(stage.name, "f")
+
+    # ---------- estimate ----------
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            state, started = dict(self._state), dict(self._started)
+        n = self._scene_count()
+
+        def left(name: str) -> float:
+            expected = self.durations.get(stage_kind(name), 0.0)
+            st = state.get(name, ".")
+            if st == "d":
+                return 0.0
+            if st == "r":
+                # Overdue stages still count a little so the ETA never reads 0 too early
+                return max(expected - (now - started.get(name, now)), 0.1 * expected)
+            return expected
+
+        def estimate(left_fn) -> float:
+            chains = [left_fn(f"image_{i}") + left_fn(f"video_{i}") for i in range(1, n + 1)]
+            audio = [left_fn(f"audio_{i}") for i in range(1, n + 1)]
+            scenes = max(max(chains, default=0.0), sum(chains) / self.scene_slots, max(audio, default=0.0))
+            return left_fn("script") + left_fn("evaluate") + scenes + left_fn("render")
+
+        eta = estimate(left)
+        total = estimate(lambda name: self.durations.get(stage_kind(name), 0.0))
+        finished = state.get("render") == "d"
+        percent = 100 if finished else min(99, max(0, round(100 * (1 - eta / total)))) if total else 0
+        scenes = [
+            "".join(state.get(f"{kind}_{i}", ".")[0] for kind in SCENE_KINDS)
+            for i in range(1, n + 1)
+        ] if self._scene_stages_known() else []
+        return {
+            "p": percent,
+            "e": 0 if finished else int(round(eta)),
+            "at": int(now),
+            "poll": 0 if finished else int(min(PROGRESS_POLL_MAX_SECS, max(PROGRESS_POLL_MIN_SECS, eta / 10))),
+            "s": scenes,
+        }
+
+    def save_history(self) -> None:
+        """Fold this run's measured stage durations into the stored EWMA."""
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+        if not samples:
+            return
+
+        def fold(stored: Dict[str, float]) -> Dict[str, float]:
+            for kind, values in samples.items():
+                for v in values:
+                    stored[kind] = ewma(stored.get(kind, DEFAULT_DURATIONS.get(kind)), v)
+            return stored
+
+        try:
+            # Conditional write: runs finishing together don't drop each other's samples
+            update_stage_stats(fold)
+        except Exception as exc:
+            print(f"[progress] could not update stage history: {exc}")
+
+    # ---------- internals ----------
+    def _set(self, name: str, st: str) -> None:
+        with self._lock:
+            self._state[name] = st
+            if st == "r":
+                self._started[name] = time.time()
+        try:
+            update_progress(self.run_id, self.snapshot())
+        except Exception as exc:
+            print(f"[progress] update failed for {self.run_id}: {exc}")
+
+    def _scene_stages_known(self) -> bool:
+        return "image_1" in list(self.scheduler.stages)
+
+    def _scene_count(self) -> int:
+        if not self._scene_stages_known():
+            return PROGRESS_DEFAULT_SCENES
+        return sum(1 for name in list(self.scheduler.stages) if stage_kind(name) == "image")
@@ -0,0 +1,100 @@
+# app/scene_diff.py
+# ------------------------------------------------------------
+# Scene-level diffing between two versions of a script.
+#
+# Every per-scene asset is determined by a few scene fields:
+#   image  visual_description, camera_directions        (Nova Canvas prompt)
+#   video  title, visual_description, mood, style, ...  (Nova Reel model_input)
+#   audio  dialogue                                     (Polly text)
+# Two scenes at the same position with equal fingerprints produce the same
+# asset, so a revised or hand-edited script only needs the assets whose
+# fingerprint changed. carry_over() applies that to a RunManifest: stage
+# entries of unchanged assets stay (and are restored on resume), the others
+# and everything downstream of them are dropped.
+# ------------------------------------------------------------
+
+import json
+from typing import Dict, List, Optional, Set
+
+from .tools.asset_cache import cache_key
+from .tools.image_tools import _scene_prompt as _image_prompt
+from .tools.video_tools import _reel_model_input
+
+ASSET_KINDS = ("image", "video", "audio")
+
+# Stages that consume every scene asset and must re-run when any of them changes
+DOWNSTREAM_STAGES = ("render",)
+
+
+def image_fingerprint(scene: dict) -> str:
+    return _image_prompt(scene)
+
+
+def video_fingerprint(scene: dict) -> str:
+    return json.dumps(_reel_model_input(scene), sort_keys=True)
+
+
+def audio_fingerprint(scene: dict) -> str:
+    return scene.get("dialogue", "") or ""
+
+
+_FINGERPRINTS = {
+    "image": image_fingerprint,
+    "video": video_fingerprint,
+    "audio": audio_fingerprint,
+}
+
+
+def scene_fingerprints(scene: dict) -> Dict[str, str]:
+    """Short digest per asset kind."""
+    return {kind: cache_key(kind, fp(scene))[:16] for kind, fp in _FINGERPRINTS.items()}
+
+
+def diff_scenes(old_scenes: List[dict], new_scenes: List[dict]) -> Dict[int, Set[str]]:
+    """
+    Asset kinds to regenerate per 1-based scene index of new_scenes.
+    Scenes are matched by position (their stages are image_<i>/video_<i>/audio_<i>);
+    a scene without an old counterpart needs every asset.
+    Unchanged scenes are omitted.
+    """
+    changed: Dict[int, Set[str]] = {}
+    for idx, scene in enumerate(new_scenes, start=1):
+        if idx > len(old_scenes):
+            changed[idx] = set(ASSET_KINDS)
+            continue
+        old, new = scene_fingerprints(old_scenes[idx - 1]), scene_fingerprints(scene)
+        kinds = {k for k in ASSET_KINDS if old[k] != new[k]}
+        if kinds:
+            changed[idx] = kinds
+    return changed
+
+
+def stale_stages(old_scenes: List[dict], new_scenes: List[dict]) -> List[str]:
+    """Stage names whose checkpointed outputs no longer match new_scenes."""
+    changed = diff_scenes(old_scenes, new_scenes)
+    names = [f"{kind}_{idx}" for idx, kinds in sorted(changed.items()) for kind in ASSET_KINDS if kind in kinds]
+    # Scenes that were dropped leave stale entries behind
+    for idx in range(len(new_scenes) + 1, len(old_scenes) + 1):
+        names += [f"{kind}_{idx}" for kind in ASSET_KINDS]
+    if names:
+        names += list(DOWNSTREAM_STAGES)
+    return names
+
+
+def carry_over(manifest, old_script: Optional[dict], new_script: dict) -> Dict[str, List[str]]:
+    """
+    Point the manifest at new_script and drop the stage entries it invalidates.
+    Returns {"regenerate": [...], "reused": [...]} stage names (not saved; call manifest.save()).
+    """
+    old_scenes = (old_script or {}).get("scenes", [])
+    new_scenes = new_script.get("scenes", [])
+    stale = stale_stages(old_scenes, new_scenes)
+    manifest.invalidate(stale)
+    manifest.set_outputs("evaluate", {"script": new_script})
+    reused = [
+        f"{kind}_{idx}"
+        for idx in range(1, len(new_scenes) + 1)
+        for kind in ASSET_KINDS
+        if f"{kind}_{idx}" not in stale and manifest.is_done(f"{kind}_{idx}")
+    ]
+    return {"regenerate": stale, "reused": reused}
@@ -0,0 +1,345 @@
+# app/scheduler.py
+# ------------------------------------------------------------
+# Small dependency-graph scheduler for the ad pipeline.
+#
+# Every Stage declares the artifact names it consumes (inputs) and the
+# ones it produces (outputs). A stage is started as soon as all of its
+# inputs exist, so independent branches (e.g. audio concat vs. scenes
+# still rendering in Nova Reel) overlap instead of running in a fixed order.
+# ------------------------------------------------------------
+
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_current = threading.local()
+
+
+def mark_cached() -> None:
+    """
+    Called from inside a stage's fn: its result came from a cache or earlier
+    speculative work, so its duration says nothing about the real cost.
+    No-op outside a stage (e.g. on a speculation thread).
+    """
+    stage = getattr(_current, "stage", None)
+    if stage is not None:
+        stage.cached = True
+
+
+class Stage:
+    """
+    One unit of pipeline work.
+
+    fn receives the declared inputs as keyword arguments and returns:
+      - None                       when the stage has no outputs
+      - the value                  when it has exactly one output
+      - a dict keyed by output     when it has several outputs
+    It may also return a concurrent.futures.Future resolving to one of the
+    above; the stage then completes when the future does, without holding
+    a worker thread while it waits.
+
+    `group` ties the stage to a user-visible step (e.g. a StepName) and
+    `pool` to a named concurrency limit on the scheduler. Stages with
+    `checkpoint=False` always run, even when a checkpoint has their outputs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        inputs: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        group: Optional[str] = None,
+        pool: Optional[str] = None,
+        checkpoint: bool = True,
+    ):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.group = group
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.restored = False
+        self.cached = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={list(self.inputs)}, outputs={list(self.outputs)})"
+
+
+class StageScheduler:
+    """
+    Runs registered stages on a thread pool as their inputs become available.
+
+    Stages may be added before run() or while it is running (e.g. a planning
+    stage that fans out per-scene stages once the scene count is known).
+
+    Hooks (all optional, called from worker threads):
+      on_group_start(group)        first stage of a group actually started
+      on_group_finish(group)       every registered stage of a group finished
+      on_stage_error(stage, exc)   a stage raised; no new stages are started
+      on_stage_start(stage)        a stage started (before restore/fn)
+      on_stage_finish(stage)       a stage finished successfully (stage.restored tells how)
+
+    `checkpoint` (optional) makes runs resumable. It must provide
+      restore(stage) -> dict | None   outputs of an earlier successful run
+      record(stage, outputs)          persist outputs of a finished stage
+    Restored stages complete immediately without calling their fn.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        limits: Optional[Dict[str, int]] = None,
+        on_group_start: Optional[Callable[[str], None]] = None,
+        on_group_finish: Optional[Callable[[str], None]] = None,
+        on_stage_error: Optional[Callable[[Stage, BaseException], None]] = None,
+        checkpoint: Any = None,
+        on_stage_start: Optional[Callable[[Stage], None]] = None,
+        on_stage_finish: Optional[Callable[[Stage], None]] = None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.limits = dict(limits or {})
+        self.on_group_start = on_group_start
+        self.on_group_finish = on_group_finish
+        self.on_stage_error = on_stage_error
+        self.on_stage_start = on_stage_start
+        self.on_stage_finish = on_stage_finish
+        self.checkpoint = checkpoint
+
+        self.artifacts: Dict[str, Any] = {}
+        self.stages: Dict[str, Stage] = {}
+        self._order: List[str] = []
+        self._waiting: List[str] = []
+        self._running: set = set()
+        self._threads_busy = 0
+        self._done: set = set()
+        self._groups_finished: set = set()
+        self._pool_use: Dict[str, int] = defaultdict(int)
+        self._producers: Dict[str, str] = {}
+        self._error: Optional[BaseException] = None
+        self._cv = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ---------- registration ----------
+    def add(self, stage: Stage) -> Stage:
+        self.add_all([stage])
+        return stage
+
+    def add_all(self, stages: Iterable[Stage]) -> None:
+        """
+        Register a batch atomically: nothing is dispatched until every stage
+        is in, so a fast (restored, cached) first stage of a fan-out can't
+        finish its group before its siblings exist.
+        """
+        stages = list(stages)
+        with self._cv:
+            names = set(self.stages)
+            producers = dict(self._producers)
+            for stage in stages:
+                if stage.name in names:
+                    raise ValueError(f"Duplicate stage name: {stage.name}")
+                names.add(stage.name)
+                for out in stage.outputs:
+                    if out in producers:
+                        raise ValueError(
+                            f"Artifact {out!r} produced by both {producers[out]!r} and {stage.name!r}"
+                        )
+                    producers[out] = stage.name
+            self._producers = producers
+            for stage in stages:
+                self.stages[stage.name] = stage
+                self._order.append(stage.name)
+                self._waiting.append(stage.name)
+            if self._executor is not None:
+                self._dispatch_locked()
+
+    # ---------- execution ----------
+    def run(self, artifacts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Block until every stage finished (or one failed). Returns all artifacts."""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as ex:
+            with self._cv:
+                self.artifacts.update(artifacts or {})
+                self._executor = ex
+                self._dispatch_locked()
+                while self._running or (self._error is None and self._ready_locked()):
+                    self._cv.wait()
+                self._executor = None
+
+        if self._error is not None:
+            raise self._error
+        if self._waiting:
+            missing = {
+                name: [i for i in self.stages[name].inputs if i not in self.artifacts]
+                for name in self._waiting
+            }
+            raise RuntimeError(f"Pipeline stalled; stages with unmet inputs: {missing}")
+        return self.artifacts
+
+    def timings(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Per-stage wall-clock start/end (epoch seconds) and duration."""
+        return {
+            name: {
+                "started_at": st.started_at,
+                "finished_at": st.finished_at,
+                "duration_seconds": round(st.duration, 3) if st.duration is not None else None,
+                "restored": st.restored,
+                "cached": st.cached,
+            }
+            for name, st in ((n, self.stages[n]) for n in self._order)
+        }
+
+    # ---------- internals (call with self._cv held) ----------
+    def _ready_locked(self) -> List[Stage]:
+        ready = []
+        for name in self._waiting:
+            st = self.stages[name]
+            if all(i in self.artifacts for i in st.inputs):
+                ready.append(st)
+        return ready
+
+    def _dispatch_locked(self) -> None:
+        if self._error is not None or self._executor is None:
+            return
+        for st in self._ready_locked():
+            # Stages parked on a Future don't hold a worker, only a pool slot
+            if self._threads_busy >= self.max_workers:
+                break
+            if st.pool and self._pool_use[st.pool] >= self.limits.get(st.pool, self.max_workers):
+                continue
+            self._waiting.remove(st.name)
+            self._running.add(st.name)
+            self._threads_busy += 1
+            if st.pool:
+                self._pool_use[st.pool] += 1
+            kwargs = {i: self.artifacts[i] for i in st.inputs}
+            self._executor.submit(self._execute, st, kwargs)
+
+    def _group_started_locked(self, group: str) -> bool:
+        """True if `group` has no stage that started before the current one."""
+        return not any(
+            s.group == group and s.started_at is not None
+            for s in self.stages.values()
+        )
+
+    def _group_finished_locked(self, group: str) -> bool:
+        """True once, when the last registered stage of `group` finishes."""
+        if group in self._groups_finished:
+            return False
+        if all(name in self._done for name, s in self.stages.items() if s.group == group):
+            self._groups_finished.add(group)
+            return True
+        return False
+
+    # ---------- worker side ----------
+    def _execute(self, stage: Stage, kwargs: Dict[str, Any]) -> None:
+        with self._cv:
+            first_in_group = bool(stage.group) and self._group_started_locked(stage.group)
+            stage.started_at = time.time()
+        if first_in_group and self.on_group_start:
+            self._safe_hook(self.on_group_start, stage.group)
+        if self.on_stage_start:
+            self._safe_hook(self.on_stage_start, stage)
+        if stage.checkpoint and self.checkpoint is not None:
+            try:
+                restored = self.checkpoint.restore(stage)
+            except Exception as exc:
+                print(f"[scheduler] checkpoint restore failed for {stage.name}: {exc}")
+                restored = None
+            if restored is not None:
+                stage.restored = True
+                self._release_thread()
+                self._finish(stage, result=restored)
+                return
+        _current.stage = stage
+        try:
+            result = stage.fn(**kwargs)
+        except BaseException as exc:
+            self._release_thread()
+            self._finish(stage, error=exc)
+            return
+        finally:
+            _current.stage = None
+        self._release_thread()
+        if isinstance(result, Future):
+            result.add_done_callback(lambda f: self._finish_future(stage, f))
+        else:
+            self._finish(stage, result=result)
+
+    def _release_thread(self) -> None:
+        with self._cv:
+            self._threads_busy -= 1
+            self._dispatch_locked()
+
+    def _finish_future(self, stage: Stage, fut: Future) -> None:
+        exc = fut.exception() if not fut.cancelled() else RuntimeError(f"Stage {stage.name} cancelled")
+        if exc is not None:
+            self._finish(stage, error=exc)
+        else:
+            self._finish(stage, result=fut.result())
+
+    def _finish(self, stage: Stage, result: Any = None, error: Optional[BaseException] = None) -> None:
+        outputs: Dict[str, Any] = {}
+        if error is None:
+            try:
+                outputs = result if stage.restored else self._outputs_of(stage, result)
+            except BaseException as exc:
+                error = exc
+        if error is None and not stage.restored and stage.checkpoint and self.checkpoint is not None:
+            self._safe_hook(self.checkpoint.record, stage, outputs)
+
+        group_done = False
+        with self._cv:
+            stage.finished_at = time.time()
+            self._running.discard(stage.name)
+            if stage.pool:
+                self._pool_use[stage.pool] -= 1
+            if error is None:
+                self.artifacts.update(outputs)
+                self._done.add(stage.name)
+                group_done = bool(stage.group) and self._group_finished_locked(stage.group)
+            elif self._error is None:
+                self._error = error
+
+        if error is not None:
+            print(f"[scheduler] stage {stage.name} failed after {stage.duration:.1f}s: {error}")
+            if self.on_stage_error:
+                self._safe_hook(self.on_stage_error, stage, error)
+        else:
+            how = "restored from checkpoint" if stage.restored else f"done in {stage.duration:.1f}s"
+            print(f"[scheduler] stage {stage.name} {how}")
+            if self.on_stage_finish:
+                self._safe_hook(self.on_stage_finish, stage)
+            if group_done and self.on_group_finish:
+                self._safe_hook(self.on_group_finish, stage.group)
+
+        with self._cv:
+            self._dispatch_locked()
+            self._cv.notify_all()
+
+    @staticmethod
+    def _outputs_of(stage: Stage, result: Any) -> Dict[str, Any]:
+        if not stage.outputs:
+            return {}
+        if len(stage.outputs) == 1:
+            return {stage.outputs[0]: result}
+        if not isinstance(result, dict) or any(o not in result for o in stage.outputs):
+            raise ValueError(f"Stage {stage.name} must return a dict with keys {list(stage.outputs)}")
+        return {o: result[o] for o in stage.outputs}
+
+    @staticmethod
+    def _safe_hook(hook: Callable, *args) -> None:
+        try:
+            hook(*args)
+        except Exception as exc:
+            print(f"[scheduler] hook {getattr(hook, '__name__', hook)} failed: {exc}")
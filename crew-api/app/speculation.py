@@ -0,0 +1,185 @@
+# app/speculation.py
+# ------------------------------------------------------------
+# Speculative scene work while the script is still being evaluated.
+#
+# Most drafts are approved on the first pass, so keyframes (and optionally
+# Nova Reel clips) are started for every scene as soon as the script writer
+# emits it. Speculative assets are written under
+#   outputs/<RUN_ID>/speculative/...
+# and adopted by the real image/video stages only when the approved scene
+# still has the same fingerprint (the inputs that determine the asset);
+# anything else is cancelled if it hasn't started, or simply left unused.
+# ------------------------------------------------------------
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .scene_diff import image_fingerprint, video_fingerprint
+from .scheduler import mark_cached
+from .tools.bedrock_clients import s3
+from .tools.image_tools import generate_scene_image
+from .tools.video_tools import start_scene_video_from_image
+
+PIPELINE_SPECULATE = os.getenv("PIPELINE_SPECULATE", "0") == "1"
+# Also start Nova Reel jobs speculatively (billed even when the scene is later revised)
+PIPELINE_SPECULATE_REEL = os.getenv("PIPELINE_SPECULATE_REEL", "0") == "1"
+
+
+class Speculator:
+    """
+    on_scene(scene) is handed to generate_script. The scene stages call
+    adopt_image/adopt_video with their normal generation as fallback: the
+    result is a Future of the adopted key, or the fallback's own result when
+    nothing matches the approved scene.
+    """
+
+    def __init__(self, bucket: str, run_prefix: str, max_workers: int = 4, reel: bool = PIPELINE_SPECULATE_REEL):
+        self.bucket = bucket
+        self.run_prefix = run_prefix.rstrip("/")
+        self.reel = reel
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._images: Dict[Tuple[object, str], Future] = {}
+        self._videos: Dict[Tuple[object, str], Future] = {}
+        self.started = 0
+        self.adopted = 0
+        self.discarded = 0
+
+    # ---------- producer side ----------
+    def on_scene(self, scene: dict) -> None:
+        scene = dict(scene)   # the script is edited (dialogue caps) after this call
+        sid = scene.get("id")
+        ikey = (sid, image_fingerprint(scene))
+        with self._lock:
+            if ikey in self._images:
+                return
+            image = self._images[ikey] = self._executor.submit(
+                generate_scene_image, scene, self.bucket, f"{self.run_prefix}/speculative/scene image"
+            )
+            self.started += 1
+            if self.reel:
+                self._videos[(sid, video_fingerprint(scene))] = self._chain(
+                    image,
+                    lambda img_key: start_scene_video_from_image(
+                        self.bucket, img_key, scene, f"{self.run_prefix}/speculative/video"
+                    ),
+                )
+        print(f"[speculate] scene {sid}: keyframe{' + clip' if self.reel else ''} started")
+
+    # ---------- consumer side ----------
+    def adopt_image(self, scene: dict, out_prefix: str, fallback: Callable[[], object]):
+        """Speculative keyframe copied to out_prefix, or fallback() when none matches or it failed."""
+        fut = self._take(self._images, (scene.get("id"), image_fingerprint(scene)))
+        if fut is None:
+            return fallback()
+        return self._copy_into(fut, out_prefix, f"scene_{scene.get('id')}.png", fallback)
+
+    def adopt_video(self, scene: dict, out_prefix: str, fallback: Callable[[], object]):
+        """Same for the Reel clip (only with PIPELINE_SPECULATE_REEL)."""
+        fut = self._take(self._videos, (scene.get("id"), video_fingerprint(scene)))
+        if fut is None:
+            return fallback()
+        return self._copy_into(fut, out_prefix, f"scene_{scene.get('id')}.mp4", fallback)
+
+    def retain(self, scenes: List[dict]) -> None:
+        """
+        Called with each revised draft: cancel speculation for scenes the
+        revision changed, so queued Canvas/Reel calls don't wait behind them.
+        """
+        keep_images = {(sc.get("id"), image_fingerprint(sc)) for sc in scenes}
+        keep_videos = {(sc.get("id"), video_fingerprint(sc)) for sc in scenes}
+        dropped = []
+        with self._lock:
+            for table, keep in ((self._images, keep_images), (self._videos, keep_videos)):
+                for key in [k for k in table if k not in keep]:
+                    dropped.append(table.pop(key))
+        for fut in dropped:
+            fut.cancel()
+        with self._lock:
+            self.discarded += len(dropped)
+        if dropped:
+            print(f"[speculate] revision dropped {len(dropped)} speculative asset(s)")
+
+    def close(self) -> None:
+        """Cancel speculation nobody adopted (running Canvas/Reel calls finish and are ignored)."""
+        with self._lock:
+            leftovers = list(self._images.values()) + list(self._videos.values())
+            self._images.clear()
+            self._videos.clear()
+        for fut in leftovers:
+            fut.cancel()
+        with self._lock:
+            self.discarded += len(leftovers)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        print(f"[speculate] started={self.started} adopted={self.adopted} discarded={self.discarded}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"started": self.started, "adopted": self.adopted, "discarded": self.discarded}
+
+    # ---------- internals ----------
+    def _take(self, table: Dict, key) -> Optional[Future]:
+        with self._lock:
+            fut = table.pop(key, None)
+        if fut is None or fut.cancelled():
+            return None
+        mark_cached()   # the calling stage only waits for work started earlier
+        return fut
+
+    def _copy_into(self, fut: Future, out_prefix: str, name: str, fallback: Callable[[], object]) -> Future:
+        dest_key = f"{out_prefix.rstrip('/')}/{name}"
+
+        def copy(src_key: str) -> str:
+            s3().copy_object(Bucket=self.bucket, Key=dest_key, CopySource={"Bucket": self.bucket, "Key": src_key})
+            with self._lock:
+                self.adopted += 1   # only once the copy landed; fallbacks don't count
+            print(f"[speculate] adopted {src_key} -> {dest_key}")
+            return dest_key
+
+        return self._chain(fut, copy, fallback)
+
+    @staticmethod
+    def _chain(fut: Future, then: Callable[[str], object], fallback: Optional[Callable[[], object]] = None) -> Future:
+        """
+        Future of then(fut.result()); then (and fallback) may return a Future.
+        If fut or then fails and a fallback is given, its result is used instead.
+        """
+        out: Future = Future()
+
+        def resolve(result=None, error: Optional[BaseException] = None) -> None:
+            if out.done():   # cancelled by close()
+                return
+            if error is not None:
+                out.set_exception(error)
+            else:
+                out.set_result(result)
+
+        def settle(res) -> None:
+            if isinstance(res, Future):
+                res.add_done_callback(
+                    lambda r: resolve(error=r.exception()) if r.exception() else resolve(r.result())
+                )
+            else:
+                resolve(res)
+
+        def done(f: Future):
+            if out.done():   # cancelled by retain()/close(): don't start follow-up work (e.g. a billed Reel job)
+                return
+            try:
+                res = then(f.result())
+            except BaseException as exc:
+                if fallback is None:
+                    resolve(error=exc)
+                    return
+                print(f"[speculate] speculative work unusable ({exc}); regenerating")
+                try:
+                    res = fallback()
+                except BaseException as exc2:
+                    resolve(error=exc2)
+                    return
+            settle(res)
+
+        fut.add_done_callback(done)
+        return out
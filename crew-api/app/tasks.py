@@ -2,10 +2,11 @@
 # ------------------------------------------------------------
 # Changes:
 # 1) Enforce short dialogue per scene (fits ~6s).
-# 2) New assembly flow:
-#    - concat all scene videos -> one video
-#    - concat all scene audios -> one audio
-#    - mux the two into final_video.mp4
+# 2) New assembly flow: one ffmpeg pass (render_final_video) normalizes and
+#    concatenates the scene videos, lays the scene audios end to end and
+#    muxes them into final_video.mp4
+# 3) Stages run on a dependency graph (app/scheduler.py) instead of a
+#    fixed sequence, so independent work overlaps.
 # ------------------------------------------------------------
 
 import os
@@ -15,28 +16,36 @@ from typing import List
 
 from crewai import Task, Crew
 from app.dynamo_status import update_status,StepName
+from app.progress import RunProgress
+from app.scheduler import Stage, StageScheduler
+from app.scene_diff import diff_scenes
+from app.speculation import PIPELINE_SPECULATE, Speculator
 from .tools.script_tools import generate_script, save_script_s3
 from .tools.evaluation_tools import evaluate_script
 from .tools.image_tools import generate_scene_image
-from .tools.video_tools import generate_scene_video_from_image
+from .tools.video_tools import start_scene_video_from_image
 from .tools.s3_utils import normalize_bucket_and_prefix
 from .tools.bedrock_clients import put_json_s3
 
 # New helpers (you'll add them in edit_tools.py below)
 from .tools.edit_tools import (
     mux_audio_over_video,        # still available if you need per-scene mux
-    concat_videos_to_single,     # NEW ffmpeg-based
-    concat_audios_to_single,     # NEW ffmpeg-based
-    mux_final_audio_video,       # NEW ffmpeg-based
+    concat_videos_to_single,     # legacy multi-pass flow
+    concat_audios_to_single,     # legacy multi-pass flow
+    mux_final_audio_video,       # legacy multi-pass flow
+    render_final_video,          # single-pass concat + mux
 )
 
 # ---- Audio tool compatibility (new and legacy) ----
 try:
     from .tools.audio_tools import synth_dialogue_for_scene as synth_dialogue_scene
+    from .tools.audio_tools import get_audio_duration
 except ImportError:
     from .tools.audio_tools import synth_dialogue as _synth_dialogue_legacy
     def synth_dialogue_scene(scene, bucket, out_prefix):
         return _synth_dialogue_legacy(scene.get("dialogue", ""), bucket, out_prefix)
+    def get_audio_duration(bucket, key):
+        return None
 
 # ---- S3 env (normalized) ----
 S3_BUCKET_RAW = os.getenv("S3_BUCKET", "")
@@ -47,6 +56,10 @@ BUCKET, DEFAULT_PREFIX = normalize_bucket_and_prefix(S3_BUCKET_RAW, S3_PREFIX_RA
 SCENE_SECONDS = int(os.getenv("SCENE_SECONDS", "6"))
 # ~150 wpm ≈ 2.5 words/sec → 6 sec ≈ 15 words. A little cushion:
 MAX_WORDS_PER_DIALOGUE = int(os.getenv("MAX_WORDS_PER_DIALOGUE", "18"))
+# How many scenes may run their image→video chain at the same time
+SCENE_MAX_IN_FLIGHT = int(os.getenv("SCENE_MAX_IN_FLIGHT", "4"))
+# Worker threads shared by all pipeline stages of one run
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", str(2 * SCENE_MAX_IN_FLIGHT + 4)))
 
 
 def _trim_to_words(text: str, max_words: int) -> str:
@@ -67,8 +80,143 @@ def _enforce_dialogue_caps(script: dict, max_words: int) -> dict:
     return script
 
 
+class _StepReporter:
+    """Maps scheduler groups (StepName values) onto the DynamoDB status row."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.progress = None   # RunProgress, also told about failed stages
+
+    def started(self, group: str) -> None:
+        update_status(self.run_id, StepName(group), "RUNNING")
+
+    def finished(self, group: str) -> None:
+        update_status(self.run_id, StepName(group), "COMPLETED")
+
+    def failed(self, stage: Stage, exc: BaseException) -> None:
+        if self.progress:
+            self.progress.stage_failed(stage, exc)
+        if stage.group:
+            update_status(self.run_id, StepName(stage.group), "FAILED")
+
+
+def _build_stages(scheduler: StageScheduler, prompts, product_name, product_desc, ad_idea, run_prefix,
+                  speculator: Speculator = None):
+    """
+    Stage graph:
+      script → evaluate → plan
+        plan fans out per scene:
+          image_<i> → video_<i>          (video_generation_status)
+          audio_<i>                      (audio_generation_status)
+        video_<1..n> + audio_<1..n> → render   (editing_status)
+
+    With a speculator, every scene a draft emits starts its keyframe right
+    away; the image/video stages adopt it if the approved scene is unchanged.
+    """
+    final_prefix = f"{run_prefix}/final video"
+    on_scene = speculator.on_scene if speculator else None
+
+    def script_stage():
+        draft = generate_script(product_name, product_desc, ad_idea, prompts["script"], on_scene=on_scene)
+        # enforce short dialogues BEFORE synthesizing audio
+        draft = _enforce_dialogue_caps(draft, MAX_WORDS_PER_DIALOGUE)
+        print("Script generated succesfully with capped dialogue.")
+        return draft
+
+    def evaluate_stage(draft):
+        script, idea = draft, ad_idea
+        verdict = evaluate_script(product_name, product_desc, script, prompts["rubric"])
+        rounds = 0
+        while verdict.get("decision") != "approve" and rounds < 3:
+            idea += f"\n\nRevision requests: {verdict.get('notes','')}"
+            previous = script
+            script = generate_script(product_name, product_desc, idea, prompts["script"], on_scene=on_scene)
+            script = _enforce_dialogue_caps(script, MAX_WORDS_PER_DIALOGUE)
+            changed = diff_scenes(previous.get("scenes", []), script.get("scenes", []))
+            print(f"Revision {rounds + 1} changed scenes: {sorted(changed) or 'none'}")
+            if speculator:
+                speculator.retain(script.get("scenes", []))
+            verdict = evaluate_script(product_name, product_desc, script, prompts["rubric"])
+            rounds += 1
+        # Save artifacts in /script/
+        save_script_s3(script, BUCKET, f"{run_prefix}/script/script.json")
+        put_json_s3(BUCKET, f"{run_prefix}/script/eval.json", verdict)
+        return {"script": script, "verdict": verdict}
+
+    def plan_stage(script):
+        scenes = script.get("scenes", [])
+        if not scenes:
+            raise ValueError("Approved script has no scenes.")
+        n = len(scenes)
+        video_names = [f"video_{i}" for i in range(1, n + 1)]
+        audio_names = [f"audio_{i}" for i in range(1, n + 1)]
+
+        def render_stage(**clips):
+            uri, key, intermediates = render_final_video(
+                BUCKET,
+                [clips[v] for v in video_names],
+                [clips[a] for a in audio_names],
+                final_prefix,
+            )
+            print("Final video at:", uri)
+            return {"uri": uri, "key": key, **intermediates}
+
+        # One batch, so no scene group can look finished before all its stages are registered
+        scheduler.add_all(_scene_stages(scenes, run_prefix, speculator) + [
+            Stage("render", render_stage, inputs=video_names + audio_names,
+                  outputs=["final"], group=StepName.editing_status.value)
+        ])
+        return n
+
+    scheduler.add_all([
+        Stage("script", script_stage, outputs=["draft"],
+              group=StepName.script_generation_status.value),
+        Stage("evaluate", evaluate_stage, inputs=["draft"], outputs=["script", "verdict"],
+              group=StepName.script_evaluation_status.value),
+        # Always re-planned: it is what registers the per-scene stages
+        Stage("plan", plan_stage, inputs=["script"], outputs=["scene_count"], checkpoint=False),
+    ])
+
+
+def _scene_stages(scenes: List[dict], run_prefix: str, speculator: Speculator = None) -> List[Stage]:
+    """image → video and audio stages for every scene (registered scene by scene)."""
+    stages: List[Stage] = []
+    for idx, scene in enumerate(scenes, start=1):
+        def image_stage(scene=scene):
+            out_prefix = f"{run_prefix}/scene image"
+            generate = lambda: generate_scene_image(scene, BUCKET, out_prefix)
+            if speculator:
+                return speculator.adopt_image(scene, out_prefix, generate)
+            return generate()
+
+        def video_stage(scene=scene, idx=idx, **inputs):
+            # 6s video from image; returns a Future resolved by the shared Reel tracker,
+            # so the stage holds a "scene" slot but no worker thread while rendering
+            out_prefix = f"{run_prefix}/video"
+            start = lambda: start_scene_video_from_image(BUCKET, inputs[f"image_{idx}"], scene, out_prefix)
+            if speculator:
+                return speculator.adopt_video(scene, out_prefix, start)
+            return start()
+
+        def audio_stage(scene=scene, idx=idx):
+            # Dialogue VO (short)
+            aud_key = synth_dialogue_scene(scene, BUCKET, f"{run_prefix}/audio")
+            print(f"Scene {idx} audio generated: {aud_key}")
+            return aud_key
+
+        stages += [
+            Stage(f"image_{idx}", image_stage, outputs=[f"image_{idx}"],
+                  group=StepName.video_generation_status.value, pool="scene"),
+            Stage(f"video_{idx}", video_stage, inputs=[f"image_{idx}"], outputs=[f"video_{idx}"],
+                  group=StepName.video_generation_status.value, pool="scene"),
+            Stage(f"audio_{idx}", audio_stage, outputs=[f"audio_{idx}"],
+                  group=StepName.audio_generation_status.value),
+        ]
+    return stages
+
+
 def run_pipeline(planner, script_writer, evaluator, imager, videographer, audio, editor,
-                 prompts, product_name, product_desc, ad_idea,current_run_id):
+                 prompts, product_name, product_desc, ad_idea,current_run_id, manifest=None):
     """
     Artifacts under:
     outputs/<RUN_ID>/
@@ -77,81 +225,53 @@ def run_pipeline(planner, script_writer, evaluator, imager, videographer, audio,
       script/summary.json
       scene image/scene_<n>.png
       video/scene_<n>.mp4
-      audio/scene_<n>.mp3
-      final video/concat_video.mp4
-      final video/concat_audio.mp4
+      audio/scene_<n>.wav
       final video/final_video.mp4
+      final video/combined_video.mp4   (only with EDIT_WRITE_INTERMEDIATES=1)
+      final video/combined_audio.m4a   (only with EDIT_WRITE_INTERMEDIATES=1)
+      manifest.json
+
+    Stages run on a dependency graph (see _build_stages); each status flag
+    flips to RUNNING/COMPLETED when its first/last stage really starts/ends.
+    When a RunManifest is given, stages it already records are skipped and
+    newly finished ones are checkpointed into outputs/<RUN_ID>/manifest.json.
+    PIPELINE_SPECULATE=1 starts keyframes (app/speculation.py) during evaluation.
+    Per-scene progress and the ETA go to the status row (app/progress.py).
     """
     run_id = current_run_id
     run_prefix = f"{DEFAULT_PREFIX}/{run_id}"
 
-    # 1) Script generation + evaluation loop
-    update_status(run_id, StepName.script_generation_status, "RUNNING")
-    script = generate_script(product_name, product_desc, ad_idea, prompts["script"])
-    # enforce short dialogues BEFORE synthesizing audio
-    script = _enforce_dialogue_caps(script, MAX_WORDS_PER_DIALOGUE)
-    print("Script generated succesfully with capped dialogue.")
-    update_status(run_id, StepName.script_generation_status, "COMPLETED")
-
-    update_status(run_id, StepName.script_evaluation_status, "RUNNING")
-    verdict = evaluate_script(product_name, product_desc, script, prompts["rubric"])
-    rounds = 0
-    while verdict.get("decision") != "approve" and rounds < 3:
-        ad_idea += f"\n\nRevision requests: {verdict.get('notes','')}"
-        script = generate_script(product_name, product_desc, ad_idea, prompts["script"])
-        script = _enforce_dialogue_caps(script, MAX_WORDS_PER_DIALOGUE)
-        verdict = evaluate_script(product_name, product_desc, script, prompts["rubric"])
-        rounds += 1
-    update_status(run_id, StepName.script_evaluation_status, "COMPLETED")
-
-    # Save artifacts in /script/
-    save_script_s3(script, BUCKET, f"{run_prefix}/script/script.json")
-    put_json_s3(BUCKET, f"{run_prefix}/script/eval.json", verdict)
-
-    update_status(run_id, StepName.video_generation_status, "RUNNING")
-    # 2) Per-scene assets (no per-scene mux anymore)
-    image_keys: List[str] = []
-    video_keys: List[str] = []
-    audio_keys: List[str] = []
-
-    for idx, scene in enumerate(script.get("scenes", []), start=1):
-        # a) Keyframe image
-        img_key = generate_scene_image(scene, BUCKET, f"{run_prefix}/scene image")
-        image_keys.append(img_key)
-
-        # b) 6s video from image (Nova Reel/Kling via env VIDEO_PROVIDER)
-        vid_key = generate_scene_video_from_image(BUCKET, img_key, scene, f"{run_prefix}/video")
-        video_keys.append(vid_key)
-        print(f"Scene {idx} video generated: {vid_key}")
-
-        # c) Dialogue VO (short)
-        aud_key = synth_dialogue_scene(scene, BUCKET, f"{run_prefix}/audio")
-        audio_keys.append(aud_key)
-        print(f"Scene {idx} audio generated: {aud_key}")
-    update_status(run_id, StepName.video_generation_status, "COMPLETED")
-
-    update_status(run_id, StepName.audio_generation_status, "RUNNING")
-
-    update_status(run_id, StepName.audio_generation_status, "COMPLETED")
-
-    update_status(run_id, StepName.editing_status, "RUNNING")
-    # 3) Concat all videos -> one silent video
-    combined_video_uri, combined_video_key, *_ = concat_videos_to_single(
-    BUCKET, video_keys, f"{run_prefix}/final video")
-    print("Concatenated video:", combined_video_key)
-
-    # 4) Concat all audios -> one audio
-    #    If some scenes have no audio (None), drop them from concat list.
-    combined_audio_uri, combined_audio_key, *_ = concat_audios_to_single(
-    BUCKET, audio_keys, f"{run_prefix}/final video")
-    print("Concatenated audio:", combined_audio_key)
-
-    # 5) Final mux (video + audio) -> final_video.mp4
-    final_uri, final_key, *_ = mux_final_audio_video(
-        BUCKET, combined_video_key, combined_audio_key, f"{run_prefix}/final video"
+    reporter = _StepReporter(run_id)
+    scheduler = StageScheduler(
+        max_workers=PIPELINE_MAX_WORKERS,
+        limits={"scene": SCENE_MAX_IN_FLIGHT},
+        on_group_start=reporter.started,
+        on_group_finish=reporter.finished,
+        on_stage_error=reporter.failed,
+        checkpoint=manifest,
     )
-    print("Final video at:", final_uri)
-    update_status(run_id, StepName.editing_status, "COMPLETED")
+    # Needs the scheduler to count the scene stages registered by plan
+    progress = RunProgress(run_id, scheduler, scene_slots=SCENE_MAX_IN_FLIGHT)
+    scheduler.on_stage_start = progress.stage_started
+    scheduler.on_stage_finish = progress.stage_finished
+    reporter.progress = progress
+    speculator = Speculator(BUCKET, run_prefix, max_workers=SCENE_MAX_IN_FLIGHT) if PIPELINE_SPECULATE else None
+    _build_stages(scheduler, prompts, product_name, product_desc, ad_idea, run_prefix, speculator)
+    try:
+        artifacts = scheduler.run()
+    finally:
+        if speculator:
+            speculator.close()
+        progress.save_history()
+
+    script = artifacts["script"]
+    n = artifacts["scene_count"]
+    image_keys = [artifacts[f"image_{i}"] for i in range(1, n + 1)]
+    video_keys = [artifacts[f"video_{i}"] for i in range(1, n + 1)]
+    audio_keys = [artifacts[f"audio_{i}"] for i in range(1, n + 1)]
+    final = artifacts["final"]
+    final_uri, final_key = final["uri"], final["key"]
+
     # Call the new function to save the final URI
     update_status(run_id, StepName.final_video_path, final_uri)
     # Summary
@@ -172,18 +292,19 @@ def run_pipeline(planner, script_writer, evaluator, imager, videographer, audio,
                 "scene_id": sc.get("id"),
                 "image_key": ik,
                 "video_key": vk,
-                "audio_key": ak
+                "audio_key": ak,
+                "audio_seconds": get_audio_duration(BUCKET, ak),
             }
             for sc, ik, vk, ak in zip(script["scenes"], image_keys, video_keys, audio_keys)
         ],
         "combined": {
-            "combined_video_key": combined_video_key,
-            "combined_video_uri": combined_video_uri,
-            "combined_audio_key": combined_audio_key,
-            "combined_audio_uri": combined_audio_uri,
+            "combined_video_key": final.get("combined_video_key"),
+            "combined_audio_key": final.get("combined_audio_key"),
             "final_video_key": final_key,
             "final_video_uri": final_uri,
         },
+        "stage_timings": scheduler.timings(),
+        "speculation": speculator.stats() if speculator else None,
     }
     put_json_s3(BUCKET, f"{run_prefix}/script/summary.json", summary)
 
@@ -0,0 +1,234 @@
+# app/tools/asset_cache.py
+# ------------------------------------------------------------
+# Content-addressed cache for generated assets (voice-over, images, clips).
+#
+# An asset is identified by a digest of everything that determines its
+# bytes (text, voice, seed, model input...). Two tiers:
+#   S3     s3://<bucket>/<ASSET_CACHE_PREFIX>/<namespace>/<ab>/<digest>.<ext>
+#          shared by every worker; a hit is a server-side copy into the run
+#          folder, so no bytes pass through this host.
+#   local  LRU directory (ASSET_CACHE_DIR, ASSET_CACHE_MAX_BYTES); used when
+#          the S3 copy is gone (e.g. expired by a lifecycle rule) and to
+#          re-seed it.
+#
+# Entries of a cache created with ttl_days are ignored once older than the
+# TTL (conditional copy, no extra request) and, with
+# ASSET_CACHE_MANAGE_LIFECYCLE=1, expired by an S3 lifecycle rule on the
+# namespace prefix.
+# ------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from ..scheduler import mark_cached
+from .bedrock_clients import put_bytes_s3, s3
+
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE", "1") == "1"
+ASSET_CACHE_BUCKET = os.getenv("ASSET_CACHE_BUCKET", "")         # default: the run's bucket
+ASSET_CACHE_PREFIX = os.getenv("ASSET_CACHE_PREFIX", "cache").strip("/")
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "vigen-asset-cache"))
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Let caches with a TTL install an expiration rule for their prefix on the bucket
+ASSET_CACHE_MANAGE_LIFECYCLE = os.getenv("ASSET_CACHE_MANAGE_LIFECYCLE", "0") == "1"
+
+# PreconditionFailed: entry older than the TTL (CopySourceIfModifiedSince)
+_MISSING = ("NoSuchKey", "404", "NotFound", "PreconditionFailed", "412")
+
+_registry: Dict[str, "AssetCache"] = {}
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable sha256 digest of JSON-serializable parts."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class AssetCache:
+    """
+    fetch(bucket, digest, ext, dest_key) materializes a cached asset at
+    bucket/dest_key and returns True, or returns False on a miss.
+    store(...) adds a freshly generated asset after the caller wrote it.
+    """
+
+    def __init__(self, namespace: str, bucket: str = ASSET_CACHE_BUCKET, prefix: str = ASSET_CACHE_PREFIX,
+                 local_dir: str = ASSET_CACHE_DIR, max_local_bytes: int = ASSET_CACHE_MAX_BYTES,
+                 enabled: bool = ASSET_CACHE_ENABLED, ttl_days: Optional[int] = None):
+        self.namespace = namespace
+        self.bucket = bucket
+        self.prefix = prefix
+        self.local_dir = Path(local_dir) / namespace
+        self.max_local_bytes = max_local_bytes
+        self.enabled = enabled
+        self.ttl_days = ttl_days if ttl_days and ttl_days > 0 else None
+        self._lifecycle_checked: set = set()
+        self._lock = threading.Lock()
+        self.s3_hits = 0
+        self.local_hits = 0
+        self.misses = 0
+        _registry[namespace] = self
+
+    # ---------- keys ----------
+    def cache_bucket(self, bucket: str) -> str:
+        return self.bucket or bucket
+
+    def s3_key(self, digest: str, ext: str) -> str:
+        return f"{self.prefix}/{self.namespace}/{digest[:2]}/{digest}.{ext}"
+
+    def _local_path(self, digest: str, ext: str) -> Path:
+        return self.local_dir / f"{digest}.{ext}"
+
+    # ---------- lookups ----------
+    def fetch(self, bucket: str, digest: str, ext: str, dest_key: str) -> bool:
+        if not self.enabled:
+            return False
+        src_bucket, src_key = self.cache_bucket(bucket), self.s3_key(digest, ext)
+        copy_kwargs = {}
+        if self.ttl_days:
+            copy_kwargs["CopySourceIfModifiedSince"] = datetime.now(timezone.utc) - timedelta(days=self.ttl_days)
+        try:
+            s3().copy_object(Bucket=bucket, Key=dest_key,
+                             CopySource={"Bucket": src_bucket, "Key": src_key}, **copy_kwargs)
+            self._count("s3_hits")
+            mark_cached()
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in _MISSING:
+                print(f"[cache:{self.namespace}] S3 tier lookup failed: {e}")
+                self._count("misses")
+                return False
+
+        data = self.read_local(digest, ext)
+        if data is None:
+            self._count("misses")
+            return False
+        put_bytes_s3(bucket, dest_key, data, content_type=self._content_type(ext))
+        self._safe(lambda: put_bytes_s3(src_bucket, src_key, data, content_type=self._content_type(ext)))
+        self._count("local_hits")
+        mark_cached()
+        return True
+
+    def store(self, bucket: str, digest: str, ext: str, src_key: str, data: Optional[bytes] = None) -> None:
+        """
+        Cache an asset already written to bucket/src_key (S3 tier via
+        server-side copy). Pass data as well to fill the local tier.
+        """
+        if not self.enabled:
+            return
+        if data is not None:
+            self._safe(lambda: self._write_local(digest, ext, data))
+        if self.ttl_days and ASSET_CACHE_MANAGE_LIFECYCLE:
+            self._safe(lambda: self.ensure_lifecycle(self.cache_bucket(bucket)))
+        self._safe(lambda: s3().copy_object(
+            Bucket=self.cache_bucket(bucket),
+            Key=self.s3_key(digest, ext),
+            CopySource={"Bucket": bucket, "Key": src_key},
+        ))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.s3_hits + self.local_hits + self.misses
+            return {
+                "s3_hits": self.s3_hits,
+                "local_hits": self.local_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.s3_hits + self.local_hits) / lookups, 3) if lookups else None,
+                "ttl_days": self.ttl_days,
+            }
+
+    # ---------- S3 tier eviction ----------
+    def lifecycle_rule_id(self) -> str:
+        return f"asset-cache-{self.prefix}-{self.namespace}".replace("/", "-")[:255]
+
+    def ensure_lifecycle(self, bucket: str) -> None:
+        """
+        Add (or update) an expiration rule for this namespace's prefix, keeping
+        the bucket's other lifecycle rules. Checked once per bucket per process.
+        """
+        if not self.ttl_days or bucket in self._lifecycle_checked:
+            return
+        self._lifecycle_checked.add(bucket)
+        rule_id = self.lifecycle_rule_id()
+        try:
+            rules = s3().get_bucket_lifecycle_configuration(Bucket=bucket).get("Rules", [])
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "NoSuchLifecycleConfiguration":
+                raise
+            rules = []
+        wanted = {
+            "ID": rule_id,
+            "Filter": {"Prefix": f"{self.prefix}/{self.namespace}/"},
+            "Status": "Enabled",
+            "Expiration": {"Days": int(self.ttl_days)},
+        }
+        current = next((r for r in rules if r.get("ID") == rule_id), None)
+        if current and current.get("Expiration") == wanted["Expiration"] and current.get("Status") == "Enabled":
+            return
+        rules = [r for r in rules if r.get("ID") != rule_id] + [wanted]
+        s3().put_bucket_lifecycle_configuration(Bucket=bucket, LifecycleConfiguration={"Rules": rules})
+        print(f"[cache:{self.namespace}] lifecycle: expire {wanted['Filter']['Prefix']} after {self.ttl_days}d")
+
+    # ---------- local LRU tier ----------
+    def read_local(self, digest: str, ext: str) -> Optional[bytes]:
+        path = self._local_path(digest, ext)
+        with self._lock:
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                return None
+            os.utime(path)   # mtime doubles as the LRU clock
+        return data
+
+    def _write_local(self, digest: str, ext: str, data: bytes) -> None:
+        if len(data) > self.max_local_bytes:
+            return
+        with self._lock:
+            self.local_dir.mkdir(parents=True, exist_ok=True)
+            path = self._local_path(digest, ext)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        files = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.local_dir.iterdir() if p.is_file()]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_local_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    # ---------- helpers ----------
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _safe(self, fn) -> None:
+        # Caching is best effort: a failed write must never fail the run
+        try:
+            fn()
+        except Exception as exc:
+            print(f"[cache:{self.namespace}] write failed: {exc}")
+
+    @staticmethod
+    def _content_type(ext: str) -> str:
+        return {
+            "mp3": "audio/mpeg",
+            "wav": "audio/wav",
+            "png": "image/png",
+            "mp4": "video/mp4",
+            "json": "application/json",
+        }.get(ext, "application/octet-stream")
+
+
+def asset_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters of every cache created in this process, by namespace."""
+    return {name: c.stats() for name, c in sorted(_registry.items())}
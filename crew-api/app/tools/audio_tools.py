@@ -1,36 +1,114 @@
 # app/tools/audio_tools.py
-import os, boto3
-from .bedrock_clients import put_bytes_s3
+import io
+import json
+import os
+import threading
+import wave
+from typing import Optional
+
+from .bedrock_clients import put_bytes_s3, polly, s3
+from .asset_cache import AssetCache, cache_key
+
+# Engine only goes into the request when set, so the Polly default stays in effect
+POLLY_ENGINE = os.getenv("POLLY_ENGINE", "")
+POLLY_RATE = "85%"
+# pcm is wrapped into a .wav the editor resamples without a lossy decode/encode; mp3 still works
+POLLY_FORMAT = os.getenv("POLLY_FORMAT", "pcm")
+POLLY_SAMPLE_RATE = os.getenv("POLLY_SAMPLE_RATE", "16000")   # pcm supports 8000 / 16000
+# Scenes of all runs synthesize in parallel, at most this many requests in flight
+POLLY_MAX_CONCURRENCY = int(os.getenv("POLLY_MAX_CONCURRENCY", "4"))
+# Also store sentence/word speech marks next to each clip (<clip>.marks.json)
+POLLY_SPEECH_MARKS = os.getenv("POLLY_SPEECH_MARKS", "0") == "1"
+
+_polly_slots = threading.BoundedSemaphore(max(1, POLLY_MAX_CONCURRENCY))
+
+# Identical lines (retries, revisions, A/B variants) are copied instead of re-synthesized
+_voice_cache = AssetCache("polly")
 
 def _polly():
-    return boto3.client("polly", region_name=os.getenv("AWS_REGION","us-east-1"))
+    return polly()
+
+def _pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Polly pcm is signed 16-bit little-endian mono; add a WAV header."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+def _synthesize(ssml_text: str, voice: str, fmt: str, **extra) -> bytes:
+    kwargs = {"Engine": POLLY_ENGINE} if POLLY_ENGINE else {}
+    with _polly_slots:
+        resp = _polly().synthesize_speech(
+            Text=ssml_text,
+            TextType="ssml",
+            VoiceId=voice,
+            OutputFormat=fmt,
+            **kwargs,
+            **extra,
+        )
+        return resp["AudioStream"].read()
+
+def get_audio_duration(bucket: str, key: str) -> Optional[float]:
+    """Clip length recorded at synthesis time (S3 metadata), without downloading or probing it."""
+    try:
+        head = s3().head_object(Bucket=bucket, Key=key)
+    except Exception:
+        return None
+    meta = head.get("Metadata", {})
+    if "duration-seconds" in meta:
+        return float(meta["duration-seconds"])
+    if key.endswith(".wav"):
+        # Our own 16-bit mono WAVs (e.g. re-seeded from the local cache tier): 44-byte header
+        return round((head["ContentLength"] - 44) / (2 * int(POLLY_SAMPLE_RATE)), 3)
+    return None
 
 def synth_dialogue_for_scene(scene: dict, bucket: str, out_prefix: str) -> str:
     """
     Generate scene-level narration with slightly slower pacing (≈85% speed).
-    Writes: outputs/<RUN_ID>/audio/scene_<id>.mp3
+    Writes: outputs/<RUN_ID>/audio/scene_<id>.wav (or .mp3 with POLLY_FORMAT=mp3)
+
+    PCM clips carry their exact duration (from the sample count) in the
+    object metadata, see get_audio_duration.
     """
     text = scene.get("dialogue", "") or " "
     voice = os.getenv("POLLY_VOICE", "Joanna")
-    fmt = os.getenv("POLLY_FORMAT", "mp3")
+    fmt = POLLY_FORMAT
+    ext = "wav" if fmt == "pcm" else fmt
 
     # Wrap text in SSML to control pace (~85% normal speed)
-    ssml_text = f"<speak><prosody rate='85%'>{text}</prosody></speak>"
+    ssml_text = f"<speak><prosody rate='{POLLY_RATE}'>{text}</prosody></speak>"
+    key = f"{out_prefix}/scene_{scene['id']}.{ext}"
 
-    resp = _polly().synthesize_speech(
-        Text=ssml_text,
-        TextType="ssml",
-        VoiceId=voice,
-        OutputFormat=fmt,
-    )
+    rate = POLLY_SAMPLE_RATE if fmt == "pcm" else None
+    digest = cache_key("polly", text, voice, fmt, rate, POLLY_RATE, POLLY_ENGINE or "standard")
+    if _voice_cache.fetch(bucket, digest, ext, key):
+        print(f"[Polly] cache hit for scene {scene['id']} ({digest[:12]})")
+        return key
 
-    audio = resp["AudioStream"].read()
-    key = f"{out_prefix}/scene_{scene['id']}.{fmt}"
-    put_bytes_s3(
-        bucket,
-        key,
-        audio,
-        content_type="audio/mpeg" if fmt == "mp3" else "application/octet-stream",
+    audio = _synthesize(ssml_text, voice, fmt, **({"SampleRate": rate} if rate else {}))
+    metadata = {}
+    if fmt == "pcm":
+        metadata["duration-seconds"] = f"{len(audio) / (2 * int(rate)):.3f}"
+        audio = _pcm_to_wav(audio, int(rate))
+
+    s3().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=audio,
+        ContentType={"wav": "audio/wav", "mp3": "audio/mpeg"}.get(ext, "application/octet-stream"),
+        Metadata=metadata,
     )
-    return key
+    _voice_cache.store(bucket, digest, ext, key, data=audio)
 
+    if POLLY_SPEECH_MARKS:
+        marks = _synthesize(ssml_text, voice, "json", SpeechMarkTypes=["sentence", "word"])
+        put_bytes_s3(
+            bucket,
+            f"{out_prefix}/scene_{scene['id']}.marks.json",
+            json.dumps([json.loads(line) for line in marks.decode("utf-8").splitlines() if line.strip()]).encode("utf-8"),
+            content_type="application/json",
+        )
+    return key
@@ -1,25 +1,74 @@
-import boto3, json, os
+import boto3, json, os, threading
 from botocore.config import Config
 from botocore.exceptions import ClientError
 
 _region = os.getenv("AWS_REGION", "us-east-1")
-_cfg = Config(retries={"max_attempts": 10, "mode": "standard"})
+
+# Connection pool per client; worker threads of all concurrent runs share these clients
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "1") == "1"
+
+_base_cfg = {
+    "retries": {"max_attempts": 10, "mode": "standard"},
+    "max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+    "tcp_keepalive": AWS_TCP_KEEPALIVE,
+}
+_cfg = Config(**_base_cfg)
+
+# --------- Client registry ----------
+# boto3 clients are thread-safe once built, but building them is slow (endpoint
+# resolution, new connection pool) and the default session is not thread-safe.
+# Build each (service, region, endpoint, config) combination once and share it.
+_session = boto3.session.Session()
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_created = 0
+
+def client(service: str, region: str = None, endpoint_url: str = None, **config_overrides):
+    """
+    Shared boto3 client for (service, region, endpoint_url, config_overrides).
+    config_overrides are botocore Config options layered over the defaults,
+    e.g. client("bedrock-runtime", read_timeout=300).
+    """
+    global _clients_created
+    region = region or _region
+    key = (service, region, endpoint_url, tuple(sorted((k, repr(v)) for k, v in config_overrides.items())))
+    c = _clients.get(key)
+    if c is not None:
+        return c
+    with _clients_lock:
+        c = _clients.get(key)
+        if c is None:
+            c = _session.client(
+                service,
+                region_name=region,
+                endpoint_url=endpoint_url,
+                config=Config(**{**_base_cfg, **config_overrides}),
+            )
+            _clients[key] = c
+            _clients_created += 1
+    return c
+
+def client_stats() -> dict:
+    """How many clients the registry built, and for which services."""
+    with _clients_lock:
+        return {
+            "created": _clients_created,
+            "clients": sorted(f"{svc}@{region}" + (f" ({ep})" if ep else "") for svc, region, ep, _ in _clients),
+            "max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+        }
 
 # --------- S3 ----------
 def s3():
-    return boto3.client("s3", region_name=_region)
+    return client("s3")
 
 # --------- Bedrock Runtime ----------
 def bedrock_runtime():
-    return boto3.client("bedrock-runtime", region_name=_region)
+    return client("bedrock-runtime")
 
-# Convenience Bedrock runtime singleton for Nova Reel helpers
-_rt = None
+# Nova Reel helpers use the same shared runtime client
 def rt():
-    global _rt
-    if _rt is None:
-        _rt = boto3.client("bedrock-runtime", region_name=_region)
-    return _rt
+    return bedrock_runtime()
 
 def presigned_http_url(bucket: str, key: str, expires_in: int = 3600) -> str:
     """
@@ -34,13 +83,11 @@ def presigned_http_url(bucket: str, key: str, expires_in: int = 3600) -> str:
         str: A temporary, signed HTTPS URL for direct access.
     """
     try:
-        s3_client = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
-        url = s3_client.generate_presigned_url(
+        url = s3().generate_presigned_url(
             ClientMethod="get_object",
             Params={"Bucket": bucket, "Key": key},
             ExpiresIn=expires_in,
         )
-        print(f"[S3] Generated presigned URL for {bucket}/{key}")
         return url
 
     except Exception as e:
@@ -49,8 +96,7 @@ def presigned_http_url(bucket: str, key: str, expires_in: int = 3600) -> str:
 
 # ---------- Nova Lite convenience (Conversation API) ----------
 def converse_text(model_id: str, text: str, max_tokens=512, temperature=0.5, top_p=0.9):
-    client = bedrock_runtime()
-    resp = client.converse(
+    resp = bedrock_runtime().converse(
         modelId=model_id,
         messages=[{"role": "user", "content": [{"text": text}]}],
         inferenceConfig={"maxTokens": max_tokens, "temperature": temperature, "topP": top_p},
@@ -104,22 +150,16 @@ def reel_get_status(invocation_arn: str) -> dict:
 
 def reel_wait(invocation_arn: str, poll_secs: int = 10, timeout_secs: int = 1800) -> dict:
     """
-    Polls until status in ('Completed','Failed'). Returns the full get_async_invoke() payload.
+    Blocks until status in ('Completed','Failed','Stopped'). Returns the job payload.
+    Polling is done by the shared ReelTracker (one poller thread for all jobs);
+    poll_secs is kept for compatibility and ignored.
     """
-    import time
-    start = time.time()
-    last = None
-    while True:
-        out = reel_get_status(invocation_arn)
-        st = out.get("status", "")
-        if st != last:
-            print(f"[Nova Reel] status: {st}")
-            last = st
-        if st in ("Completed", "Failed", "Stopped"):
-            return out
-        if time.time() - start > timeout_secs:
-            raise TimeoutError(f"Nova Reel async job timed out after {timeout_secs}s")
-        time.sleep(poll_secs)
+    return reel_track(invocation_arn, timeout_secs=timeout_secs).result()
+
+def reel_track(invocation_arn: str, timeout_secs: int = 1800):
+    """Future resolved with the job payload once the invocation reaches a terminal status."""
+    from .reel_tracker import get_reel_tracker
+    return get_reel_tracker().track(invocation_arn, timeout_secs=timeout_secs)
 
 # 🔧 Alias expected by other modules (e.g., video_tools.py)
 def reel_wait_for_completion(invocation_arn: str, poll_secs: int = 8, max_wait_secs: int = 1800) -> dict:
@@ -128,8 +168,7 @@ def reel_wait_for_completion(invocation_arn: str, poll_secs: int = 8, max_wait_s
 
 # (Kept for compatibility if anything else calls it)
 def reel_get_async(invocation_arn: str):
-    client = bedrock_runtime()
-    return client.get_async_invoke(invocationArn=invocation_arn)
+    return bedrock_runtime().get_async_invoke(invocationArn=invocation_arn)
 
 # ---------- Misc AWS helpers ----------
 def put_bytes_s3(bucket, key, data: bytes, content_type="application/octet-stream"):
@@ -147,32 +186,28 @@ def put_json_s3(bucket, key, obj):
     )
     return key
 
+def get_json_s3(bucket, key):
+    """Load a JSON object from S3. Returns None when the key does not exist."""
+    try:
+        obj = s3().get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(obj["Body"].read())
+
 def polly():
-    return boto3.client("polly", region_name=_region, config=_cfg)
+    return client("polly")
 
 def mediaconvert():
     # endpoint can be discovered once and stored
     endpoint = os.getenv("MEDIACONVERT_ENDPOINT", "").strip()
-    mc = boto3.client(
-        "mediaconvert",
-        region_name=_region,
-        config=_cfg,
-        endpoint_url=endpoint if endpoint else None,
-    )
     if not endpoint:
         # discover and cache
-        endpoints = mc.describe_endpoints()
-        url = endpoints["Endpoints"][0]["Url"]
-        os.environ["MEDIACONVERT_ENDPOINT"] = url
-        mc = boto3.client("mediaconvert", region_name=_region, config=_cfg, endpoint_url=url)
-    return mc
-
-def presigned_http_url(bucket, key, expires_in=3600):
-    return s3().generate_presigned_url(
-        ClientMethod="get_object",
-        Params={"Bucket": bucket, "Key": key},
-        ExpiresIn=expires_in,
-    )
+        endpoints = client("mediaconvert").describe_endpoints()
+        endpoint = endpoints["Endpoints"][0]["Url"]
+        os.environ["MEDIACONVERT_ENDPOINT"] = endpoint
+    return client("mediaconvert", endpoint_url=endpoint)
 
 def s3_url(bucket, key):
     return f"s3://{bucket}/{key.lstrip('/')}"
@@ -436,15 +436,52 @@
 
 
 # app/tools/edit_tools.py
+import json
 import os
 import shlex
 import subprocess
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional
-import boto3
+from typing import List, Tuple, Optional, Union
 import platform
 
+from .bedrock_clients import s3, presigned_http_url
+
+# Final edit format (matches the legacy concat/mux steps)
+FINAL_WIDTH, FINAL_HEIGHT, FINAL_FPS = 1280, 720, 30
+# Silence between consecutive dialogue clips (default for concat_audios_to_single / render_final_video)
+AUDIO_GAP_SECONDS = float(os.getenv("AUDIO_GAP_SECONDS", "1.5"))
+# Also upload combined_video.mp4 / combined_audio.m4a from render_final_video (debugging aid)
+EDIT_WRITE_INTERMEDIATES = os.getenv("EDIT_WRITE_INTERMEDIATES", "0") == "1"
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))   # respects container / taskset limits
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Parallel S3 transfers per edit call
+EDIT_DOWNLOAD_WORKERS = int(os.getenv("EDIT_DOWNLOAD_WORKERS", "8"))
+# Encoder threads given to each of the parallel per-clip normalize encodes (-threads);
+# single-process encodes (final render, mux) leave threading to ffmpeg
+FFMPEG_THREADS = max(1, int(os.getenv("FFMPEG_THREADS", "2")))
+# ffmpeg processes allowed at once across the whole worker process;
+# jobs x threads stays within the available CPUs
+FFMPEG_MAX_PROCS = max(1, int(os.getenv("FFMPEG_MAX_PROCS", str(_available_cpus() // FFMPEG_THREADS))))
+# Stream-copy clips that already share one format instead of re-encoding them (0 = always re-encode)
+EDIT_STREAM_COPY = os.getenv("EDIT_STREAM_COPY", "1") == "1"
+# render_final_video reads inputs from presigned URLs and streams fragmented MP4 into a
+# multipart upload, so no clip or output touches local disk
+EDIT_STREAMING_IO = os.getenv("EDIT_STREAMING_IO", "0") == "1"
+# Multipart part size for streamed uploads (S3 minimum is 5 MiB)
+EDIT_UPLOAD_PART_BYTES = max(5 * 1024 * 1024, int(os.getenv("EDIT_UPLOAD_PART_BYTES", str(8 * 1024 * 1024))))
+# ffmpeg needs http(s) allowed explicitly when a concat list points at URLs
+_URL_PROTOCOLS = "file,http,https,tcp,tls,crypto"
+
 # ---------- Cross-platform path quoting ----------
 def _ffmpeg_quote(path: str) -> str:
     """Cross-platform quoting for FFmpeg paths."""
@@ -453,31 +490,44 @@ def _ffmpeg_quote(path: str) -> str:
     return shlex.quote(path)
 
 
-# ---------- Simple S3 helpers ----------
-_s3 = boto3.client("s3")
-
+# ---------- Simple S3 helpers (shared pooled client) ----------
 def _download_s3(bucket: str, key: str, dst_dir: Path) -> Path:
     dst = dst_dir / Path(key).name
     dst.parent.mkdir(parents=True, exist_ok=True)
-    _s3.download_file(bucket, key, str(dst))
+    s3().download_file(bucket, key, str(dst))
     return dst
 
 def _upload_s3(bucket: str, src: Path, key: str) -> Tuple[str, str]:
     key = key.strip("/")
-    _s3.upload_file(str(src), bucket, key)
+    s3().upload_file(str(src), bucket, key)
     return (http_url(bucket, key), key)
 
 def http_url(bucket: str, key: str) -> str:
     return f"https://{bucket}.s3.amazonaws.com/{key}"
 
+def _download_many(bucket: str, keys: List[str], dst_dir: Path) -> List[Path]:
+    """Download several objects concurrently; paths come back in key order."""
+    if len(keys) <= 1:
+        return [_download_s3(bucket, k, dst_dir) for k in keys]
+    with ThreadPoolExecutor(max_workers=min(EDIT_DOWNLOAD_WORKERS, len(keys)),
+                            thread_name_prefix="edit-dl") as ex:
+        return list(ex.map(lambda k: _download_s3(bucket, k, dst_dir), keys))
+
 
 # ---------- FFmpeg runner ----------
+def _ffmpeg_argv(cmd: str) -> List[str]:
+    """
+    Split a command built with _ffmpeg_quote into argv. ffmpeg is started
+    without a shell, so killing the process kills ffmpeg itself.
+    """
+    return shlex.split(cmd)
+
+
 def _run_ffmpeg(cmd: str) -> None:
-    """Execute an ffmpeg shell command and surface stderr on failure."""
+    """Execute an ffmpeg command and surface stderr on failure."""
     print(f"\n🚀 ffmpeg: {cmd}")
     proc = subprocess.run(
-        cmd,
-        shell=True,
+        _ffmpeg_argv(cmd),
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
@@ -491,6 +541,164 @@ def _run_ffmpeg(cmd: str) -> None:
         )
 
 
+def _run_ffmpeg_to_s3(cmd: str, bucket: str, key: str, content_type: str = "video/mp4") -> Tuple[str, str]:
+    """
+    Run an ffmpeg command that writes its output to stdout (pipe:1) and
+    stream it into an S3 multipart upload, EDIT_UPLOAD_PART_BYTES at a time.
+    The upload is aborted if ffmpeg fails.
+    """
+    key = key.strip("/")
+    print(f"\n🚀 ffmpeg → s3://{bucket}/{key}: {cmd}")
+    client = s3()
+    proc = subprocess.Popen(_ffmpeg_argv(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr on the side so ffmpeg never blocks on a full pipe
+    stderr_chunks: List[bytes] = []
+    drain = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    upload_id = None
+    parts = []
+    try:
+        upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)["UploadId"]
+        buf = bytearray()
+        while True:
+            chunk = proc.stdout.read(1024 * 1024)
+            if chunk:
+                buf += chunk
+            if buf and (len(buf) >= EDIT_UPLOAD_PART_BYTES or not chunk):
+                n = len(parts) + 1
+                resp = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                          PartNumber=n, Body=bytes(buf))
+                parts.append({"PartNumber": n, "ETag": resp["ETag"]})
+                buf.clear()
+            if not chunk:
+                break
+        rc = proc.wait()
+        drain.join()
+        if rc != 0 or not parts:
+            stderr = b"".join(stderr_chunks).decode(errors="replace").strip()
+            raise RuntimeError(f"❌ FFmpeg failed: {cmd}\n--- stderr ---\n{stderr}")
+        client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                         MultipartUpload={"Parts": parts})
+    except BaseException:
+        proc.kill()
+        proc.wait()   # reap it, so the pool slot is only freed once ffmpeg is gone
+        if upload_id:
+            try:
+                client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            except Exception as exc:
+                print(f"[S3] abort_multipart_upload failed for {key}: {exc}")
+        raise
+    return http_url(bucket, key), key
+
+
+# Shared by every run in the process so concurrent edits can't oversubscribe the CPUs
+_ffmpeg_pool: Optional[ThreadPoolExecutor] = None
+_ffmpeg_pool_lock = threading.Lock()
+
+
+def _get_ffmpeg_pool() -> ThreadPoolExecutor:
+    global _ffmpeg_pool
+    with _ffmpeg_pool_lock:
+        if _ffmpeg_pool is None:
+            _ffmpeg_pool = ThreadPoolExecutor(max_workers=FFMPEG_MAX_PROCS, thread_name_prefix="ffmpeg")
+        return _ffmpeg_pool
+
+
+def _run_ffmpeg_many(cmds: List[str]) -> None:
+    """
+    Run independent ffmpeg commands on the bounded process pool (at most
+    FFMPEG_MAX_PROCS at once). Waits for all of them; raises the first failure.
+    """
+    futures = [_get_ffmpeg_pool().submit(_run_ffmpeg, c) for c in cmds]
+    errors = [f.exception() for f in futures]
+    for exc in errors:
+        if exc is not None:
+            raise exc
+
+
+# ---------- ffprobe compatibility check ----------
+# Stream properties that must be identical for the concat demuxer to `-c copy` clips together
+_COPY_KEYS = ("codec_name", "profile", "width", "height", "r_frame_rate", "pix_fmt", "time_base")
+_COPY_CODECS = {"h264"}
+_COPY_PIX_FMTS = {"yuv420p"}
+
+
+def _probe_video(src: Union[Path, str]) -> Optional[dict]:
+    """Format of the first video stream (see _COPY_KEYS), or None if ffprobe can't tell."""
+    name = Path(str(src).split("?", 1)[0]).name   # presigned URLs: drop the signature
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", f"stream={','.join(_COPY_KEYS)}",
+        "-of", "json", str(src),
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        print(f"ffprobe unavailable for {name}: {exc}")
+        return None
+    if proc.returncode != 0:
+        print(f"ffprobe failed for {name}: {proc.stderr.strip()}")
+        return None
+    streams = json.loads(proc.stdout or "{}").get("streams") or []
+    if not streams:
+        return None
+    return {k: streams[0].get(k) for k in _COPY_KEYS}
+
+
+def _copyable(info: Optional[dict]) -> bool:
+    return bool(info) and info["codec_name"] in _COPY_CODECS and info["pix_fmt"] in _COPY_PIX_FMTS
+
+
+def _stream_copy_clips(local_videos: List[Union[Path, str]]) -> Optional[List[Union[Path, str]]]:
+    """
+    The clips, unchanged, when every one of them is h264/yuv420p with the same
+    format (see _COPY_KEYS) and can be `-c copy` concatenated. Otherwise (or
+    with stream copy off, or ffprobe missing) None, and the caller re-encodes
+    everything: mixing re-encoded clips with copied ones would concatenate
+    streams with different SPS/PPS under the first clip's codec extradata.
+    Clips may be local paths or URLs.
+    """
+    if not EDIT_STREAM_COPY or not local_videos:
+        return None
+    with ThreadPoolExecutor(max_workers=min(EDIT_DOWNLOAD_WORKERS, len(local_videos)),
+                            thread_name_prefix="ffprobe") as ex:
+        infos = list(ex.map(_probe_video, local_videos))
+    if not all(_copyable(i) for i in infos) or any(i != infos[0] for i in infos):
+        print("Stream-copy concat: clip formats differ; re-encoding all clips")
+        return None
+    print(f"Stream-copy concat: {len(local_videos)} clips at "
+          f"{infos[0]['width']}x{infos[0]['height']}@{infos[0]['r_frame_rate']}")
+    return list(local_videos)
+
+
+def _audio_concat_graph(first_input: int, n_audios: int, gap_seconds: float) -> List[str]:
+    """
+    Filter chains that resample inputs first_input.. to 48 kHz stereo and
+    concatenate them into [acat], with gap_seconds of silence after every clip
+    but the last. The silence is apad'ed in the graph: no extra ffmpeg process
+    or silence file per gap.
+    """
+    parts = []
+    for j in range(n_audios):
+        chain = (
+            f"[{first_input + j}:a]aformat=sample_rates=48000:channel_layouts=stereo,"
+            f"asetpts=PTS-STARTPTS"
+        )
+        if gap_seconds > 0 and j < n_audios - 1:
+            chain += f",apad=pad_dur={gap_seconds:g}"
+        parts.append(f"{chain}[a{j}]")
+    parts.append("".join(f"[a{j}]" for j in range(n_audios)) + f"concat=n={n_audios}:v=0:a=1[acat]")
+    return parts
+
+
+def _write_concat_list(paths: List[Union[Path, str]], list_file: Path) -> Path:
+    with list_file.open("w") as f:
+        for p in paths:
+            f.write(f"file '{p.resolve() if isinstance(p, Path) else p}'\n")
+    return list_file
+
+
 # ---------- Public API ----------
 def mux_audio_over_video(
     bucket: str,
@@ -510,14 +718,21 @@ def mux_audio_over_video(
 
     with tempfile.TemporaryDirectory() as td:
         tdir = Path(td)
-        vpath = _download_s3(bucket, video_key, tdir)
-        apath = _download_s3(bucket, audio_key, tdir)
+        vpath, apath = _download_many(bucket, [video_key, audio_key], tdir)
         out_local = tdir / Path(out_key).name
 
+        info = _probe_video(vpath) if EDIT_STREAM_COPY else None
+        if _copyable(info) and (info["width"], info["height"]) == (FINAL_WIDTH, FINAL_HEIGHT):
+            # Already a 1280x720 h264 clip (e.g. straight from Nova Reel): only the audio is encoded
+            video_opts = "-map 0:v:0 -map 1:a:0 -c:v copy"
+        else:
+            video_opts = (
+                f'-vf "scale=1280:720,fps=30" '
+                f'-c:v libx264 -preset medium -crf 20'
+            )
         cmd = (
             f'ffmpeg -y -i {_ffmpeg_quote(str(vpath))} -i {_ffmpeg_quote(str(apath))} '
-            f'-vf "scale=1280:720,fps=30" '
-            f'-c:v libx264 -preset medium -crf 20 '
+            f'{video_opts} '
             f'-c:a aac -b:a 192k -ar 48000 -shortest {_ffmpeg_quote(str(out_local))}'
         )
         _run_ffmpeg(cmd)
@@ -538,30 +753,31 @@ def concat_videos_to_single(
 
     with tempfile.TemporaryDirectory() as td:
         tdir = Path(td)
-        local_videos = [_download_s3(bucket, k, tdir) for k in video_keys]
-        normalized_files = []
-
-        # Normalize videos
-        for i, lv in enumerate(local_videos, start=1):
-            norm_path = tdir / f"norm_{i}.mp4"
-            cmd = (
-                f'ffmpeg -y -i {_ffmpeg_quote(str(lv))} '
-                f'-vf "scale=1280:720,fps=30,format=yuv420p" '
-                f'-c:v libx264 -preset fast -crf 20 -an {_ffmpeg_quote(str(norm_path))}'
-            )
-            _run_ffmpeg(cmd)
-            normalized_files.append(norm_path)
+        local_videos = _download_many(bucket, video_keys, tdir)
+
+        # Clips that already share one format are stream-copied; otherwise all are re-encoded
+        normalized_files = _stream_copy_clips(local_videos)
+        if normalized_files is None:
+            # Normalize videos (in parallel on the ffmpeg pool)
+            normalized_files, cmds = [], []
+            for i, lv in enumerate(local_videos, start=1):
+                norm_path = tdir / f"norm_{i}.mp4"
+                cmds.append(
+                    f'ffmpeg -y -i {_ffmpeg_quote(str(lv))} '
+                    f'-vf "scale=1280:720,fps=30,format=yuv420p" '
+                    f'-c:v libx264 -preset fast -crf 20 -threads {FFMPEG_THREADS} '
+                    f'-an {_ffmpeg_quote(str(norm_path))}'
+                )
+                normalized_files.append(norm_path)
+            _run_ffmpeg_many(cmds)
 
         # Concat list file
-        list_file = tdir / "concat_list.txt"
-        with list_file.open("w") as f:
-            for nf in normalized_files:
-                f.write(f"file '{nf.resolve()}'\n")
+        list_file = _write_concat_list(normalized_files, tdir / "concat_list.txt")
 
         out_local = tdir / "combined_video.mp4"
         cmd = (
             f'ffmpeg -y -f concat -safe 0 -i {_ffmpeg_quote(str(list_file))} '
-            f'-c copy {_ffmpeg_quote(str(out_local))}'
+            f'-map 0:v -c copy {_ffmpeg_quote(str(out_local))}'
         )
         _run_ffmpeg(cmd)
 
@@ -574,45 +790,28 @@ def concat_audios_to_single(
     audio_keys: List[str],
     out_prefix: str,
     wait: bool = True,
+    gap_seconds: float = AUDIO_GAP_SECONDS,
 ) -> Tuple[str, str, Optional[str]]:
-    """Concatenate multiple audio files into a single AAC (m4a) track."""
+    """
+    Concatenate multiple audio files into a single AAC (m4a) track, with
+    gap_seconds of silence between clips. Resampling, gaps and concat happen
+    in one ffmpeg filter graph.
+    """
     out_prefix = out_prefix.strip("/")
     out_key = f"{out_prefix}/combined_audio.m4a"
 
     with tempfile.TemporaryDirectory() as td:
         tdir = Path(td)
-        local_audios = [_download_s3(bucket, k, tdir) for k in audio_keys]
-        normalized_audios = []
-
-        # Normalize audios
-        for i, la in enumerate(local_audios, start=1):
-            norm_path = tdir / f"norm_{i}.m4a"
-            cmd = (
-                f'ffmpeg -y -i {_ffmpeg_quote(str(la))} '
-                f'-ar 48000 -ac 2 -c:a aac -b:a 192k {_ffmpeg_quote(str(norm_path))}'
-            )
-            _run_ffmpeg(cmd)
-            normalized_audios.append(norm_path)
-
-        # Add 1.5s silence between clips
-        list_file = tdir / "audio_list.txt"
-        with list_file.open("w") as f:
-            for i, p in enumerate(normalized_audios):
-                f.write(f"file '{p.resolve()}'\n")
-                if i < len(normalized_audios) - 1:
-                    silence = tdir / f"silence_{i}.m4a"
-                    os.system(
-                        f'ffmpeg -f lavfi -i anullsrc=r=48000:cl=stereo:d=1.5 '
-                        f'-c:a aac -b:a 192k -ar 48000 {silence}'
-                    )
-                    f.write(f"file '{silence.resolve()}'\n")
+        local_audios = _download_many(bucket, audio_keys, tdir)
 
+        inputs = " ".join(f"-i {_ffmpeg_quote(str(p))}" for p in local_audios)
+        graph = ";".join(_audio_concat_graph(0, len(local_audios), gap_seconds))
         out_local = tdir / "combined_audio.m4a"
         cmd = (
-            f'ffmpeg -y -f concat -safe 0 -i {_ffmpeg_quote(str(list_file))} '
-            f'-c:a aac -b:a 192k -ar 48000 {_ffmpeg_quote(str(out_local))}'
+            f"ffmpeg -y {inputs} -filter_complex {_ffmpeg_quote(graph)} "
+            f'-map "[acat]" -c:a aac -b:a 192k -ar 48000 {_ffmpeg_quote(str(out_local))}'
         )
-        _run_ffmpeg(cmd)
+        _run_ffmpeg_many([cmd])
 
         url, key = _upload_s3(bucket, out_local, out_key)
         return url, key, None
@@ -630,8 +829,7 @@ def mux_final_audio_video(
 
     with tempfile.TemporaryDirectory() as td:
         tdir = Path(td)
-        vpath = _download_s3(bucket, combined_video_key, tdir)
-        apath = _download_s3(bucket, combined_audio_key, tdir)
+        vpath, apath = _download_many(bucket, [combined_video_key, combined_audio_key], tdir)
         out_local = tdir / "final_video.mp4"
 
         # ✅ Proper mux command
@@ -645,3 +843,141 @@ def mux_final_audio_video(
 
         url, key = _upload_s3(bucket, out_local, out_key)
         return url, key
+
+
+def _final_filter_graph(n_videos: int, n_audios: int, write_intermediates: bool,
+                        copy_video: bool = False, gap_seconds: float = AUDIO_GAP_SECONDS) -> str:
+    """
+    filter_complex for render_final_video. Inputs 0..n_videos-1 are scene
+    clips, the following n_audios inputs are dialogue clips. With copy_video
+    input 0 is the concat-demuxer list of (stream-copied) clips and only the
+    audio goes through the graph.
+    Produces [vout]/[aout] (+ [vdbg]/[adbg] copies for the intermediates).
+    """
+    parts = []
+    first_audio = 1 if copy_video else n_videos
+    if not copy_video:
+        for i in range(n_videos):
+            parts.append(
+                f"[{i}:v]scale={FINAL_WIDTH}:{FINAL_HEIGHT},fps={FINAL_FPS},format=yuv420p,"
+                f"setsar=1,setpts=PTS-STARTPTS[v{i}]"
+            )
+        parts.append("".join(f"[v{i}]" for i in range(n_videos)) + f"concat=n={n_videos}:v=1:a=0[vcat]")
+
+    parts += _audio_concat_graph(first_audio, n_audios, gap_seconds)
+
+    if write_intermediates:
+        if not copy_video:
+            parts.append("[vcat]split=2[vout][vdbg]")
+        parts.append("[acat]asplit=2[aout][adbg]")
+    else:
+        if not copy_video:
+            parts.append("[vcat]null[vout]")
+        parts.append("[acat]anull[aout]")
+    return ";".join(parts)
+
+
+def render_final_video(
+    bucket: str,
+    video_keys: List[str],
+    audio_keys: List[str],
+    out_prefix: str,
+    write_intermediates: Optional[bool] = None,
+    gap_seconds: float = AUDIO_GAP_SECONDS,
+    streaming: Optional[bool] = None,
+) -> Tuple[str, str, dict]:
+    """
+    Single-pass edit: one ffmpeg process normalizes every scene clip
+    (scale/fps/format), concatenates them, lays the dialogue clips end to end
+    with gap_seconds of silence between them and muxes the result into
+    final_video.mp4. Replaces concat_videos_to_single + concat_audios_to_single
+    + mux_final_audio_video (two fewer encodes, four fewer S3 round trips).
+
+    When the clips already share one format (ffprobe check, see
+    _stream_copy_clips) the video is stream-copied through the concat demuxer
+    and only the audio is encoded; otherwise every clip is re-encoded.
+
+    With streaming (default EDIT_STREAMING_IO) ffmpeg reads the clips from
+    presigned URLs and writes fragmented MP4 to stdout, which is uploaded to
+    S3 part by part: nothing but the concat list touches local disk. The
+    intermediates are not written in this mode.
+
+    With write_intermediates (default EDIT_WRITE_INTERMEDIATES) the same process
+    also writes combined_video.mp4 / combined_audio.m4a for debugging.
+    Returns (http_url, out_key, intermediate_keys).
+    """
+    if write_intermediates is None:
+        write_intermediates = EDIT_WRITE_INTERMEDIATES
+    if streaming is None:
+        streaming = EDIT_STREAMING_IO
+    if streaming and write_intermediates:
+        print("render_final_video: intermediates are not written in streaming mode")
+        write_intermediates = False
+    video_keys = [k for k in video_keys if k]
+    audio_keys = [k for k in audio_keys if k]
+    if not video_keys:
+        raise ValueError("render_final_video needs at least one scene video.")
+    if not audio_keys:
+        raise ValueError("render_final_video needs at least one dialogue clip.")
+
+    out_prefix = out_prefix.strip("/")
+    out_key = f"{out_prefix}/final_video.mp4"
+
+    with tempfile.TemporaryDirectory() as td:
+        tdir = Path(td)
+        if streaming:
+            local_videos = [presigned_http_url(bucket, k) for k in video_keys]
+            local_audios = [presigned_http_url(bucket, k) for k in audio_keys]
+        else:
+            local_videos = _download_many(bucket, video_keys, tdir / "video")
+            local_audios = _download_many(bucket, audio_keys, tdir / "audio")
+        out_local = tdir / "final_video.mp4"
+
+        copy_clips = _stream_copy_clips(local_videos)
+        copy_video = copy_clips is not None
+        audio_inputs = " ".join(f"-i {_ffmpeg_quote(str(p))}" for p in local_audios)
+        graph = _final_filter_graph(
+            len(local_videos), len(local_audios), write_intermediates, copy_video, gap_seconds
+        )
+        if copy_video:
+            list_file = _write_concat_list(copy_clips, tdir / "concat_list.txt")
+            whitelist = f"-protocol_whitelist {_URL_PROTOCOLS} " if streaming else ""
+            inputs = f"-f concat -safe 0 {whitelist}-i {_ffmpeg_quote(str(list_file))} {audio_inputs}"
+            vmap, vcodec, dbg_vmap = "0:v", "-c:v copy", "0:v"
+        else:
+            inputs = " ".join(f"-i {_ffmpeg_quote(str(p))}" for p in local_videos) + f" {audio_inputs}"
+            vmap, vcodec, dbg_vmap = "[vout]", "-c:v libx264 -preset medium -crf 20 -pix_fmt yuv420p", "[vdbg]"
+
+        cmd = (
+            f"ffmpeg -y {inputs} -filter_complex {_ffmpeg_quote(graph)} "
+            f'-map "{vmap}" -map "[aout]" '
+            f"{vcodec} "
+            f"-c:a aac -b:a 192k -ar 48000 "
+        )
+        if streaming:
+            # +faststart needs a seekable file; fragmented MP4 plays progressively from a pipe
+            cmd += "-movflags frag_keyframe+empty_moov+default_base_moof -f mp4 pipe:1"
+            url, key = _get_ffmpeg_pool().submit(_run_ffmpeg_to_s3, cmd, bucket, out_key).result()
+            return url, key, {}
+
+        cmd += f"-movflags +faststart {_ffmpeg_quote(str(out_local))}"
+        if write_intermediates:
+            dbg_vcodec = "-c:v copy" if copy_video else "-c:v libx264 -preset fast -crf 20"
+            cmd += (
+                f' -map "{dbg_vmap}" {dbg_vcodec} -an '
+                f"{_ffmpeg_quote(str(tdir / 'combined_video.mp4'))}"
+                f' -map "[adbg]" -c:a aac -b:a 192k -ar 48000 '
+                f"{_ffmpeg_quote(str(tdir / 'combined_audio.m4a'))}"
+            )
+        # Through the shared pool so concurrent runs' renders count against the CPU budget
+        _run_ffmpeg_many([cmd])
+
+        intermediates = {}
+        if write_intermediates:
+            _, intermediates["combined_video_key"] = _upload_s3(
+                bucket, tdir / "combined_video.mp4", f"{out_prefix}/combined_video.mp4")
+            _, intermediates["combined_audio_key"] = _upload_s3(
+                bucket, tdir / "combined_audio.m4a", f"{out_prefix}/combined_audio.m4a")
+
+        url, key = _upload_s3(bucket, out_local, out_key)
+        return url, key, intermediates
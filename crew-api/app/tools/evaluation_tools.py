@@ -1,6 +1,7 @@
 import json, os
 from tenacity import retry, stop_after_attempt, wait_exponential
 from .bedrock_clients import converse_text
+from .llm_cache import get_llm_cache
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -10,8 +11,20 @@ def _get_eval_model():
         raise RuntimeError("BEDROCK_EVAL_MODEL_ID (Nova Lite) is required.")
     return mid
 
+def _parse_verdict(text: str) -> dict:
+    # Expect strict JSON per our rubric; still guard-parse
+    try:
+        return json.loads(text)
+    except Exception as e:
+        # Last resort: find first balanced JSON in text
+        start = text.find("{"); end = text.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            return json.loads(text[start:end+1])
+        raise
+
 @retry(stop=stop_after_attempt(3), wait=wait_exponential())
-def evaluate_script(product_name: str, product_desc: str, script_dict: dict, rubric_markdown: str) -> dict:
+def evaluate_script(product_name: str, product_desc: str, script_dict: dict, rubric_markdown: str,
+                    use_cache: bool = None) -> dict:
     # print("We are in eval script===============")
     model_id = _get_eval_model()
     # print("eval modelid=========14===",model_id)
@@ -24,14 +37,9 @@ def evaluate_script(product_name: str, product_desc: str, script_dict: dict, rub
         "Return STRICT JSON only per rubric."
     )
 
-    text = converse_text(model_id, payload, max_tokens=800, temperature=0.2, top_p=0.9)
-
-    # Expect strict JSON per our rubric; still guard-parse
-    try:
-        return json.loads(text)
-    except Exception as e:
-        # Last resort: find first balanced JSON in text
-        start = text.find("{"); end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            return json.loads(text[start:end+1])
-        raise
+    config = {"max_tokens": 800, "temperature": 0.2, "top_p": 0.9}
+    return get_llm_cache().call(
+        "evaluate_script", model_id, payload, config,
+        lambda: converse_text(model_id, payload, **config),
+        _parse_verdict, use_cache,
+    )
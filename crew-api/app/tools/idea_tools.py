@@ -1,6 +1,7 @@
 import json, os, re
 from tenacity import retry, stop_after_attempt, wait_exponential
 from .bedrock_clients import bedrock_runtime
+from .llm_cache import get_llm_cache
 
 def _get_model_id():
     return os.getenv("BEDROCK_IDEA_MODEL_ID") or os.getenv("BEDROCK_SCRIPT_MODEL_ID")
@@ -13,8 +14,17 @@ def _unwrap_code_fence(text: str) -> str:
     m = re.match(r"```(?:json)?\s*(.*?)\s*```", (text or "").strip(), flags=re.S|re.I)
     return m.group(1) if m else (text or "")
 
+def _parse_idea(text: str) -> str:
+    text = _unwrap_code_fence(text)
+    try:
+        data = json.loads(text)
+        return data.get("idea") or text.strip()
+    except Exception:
+        return text.strip()
+
 @retry(stop=stop_after_attempt(3), wait=wait_exponential())
-def generate_ad_idea(product_name: str, product_description: str, prompt_template: str) -> str:
+def generate_ad_idea(product_name: str, product_description: str, prompt_template: str,
+                     use_cache: bool = None) -> str:
     model_id = _get_model_id(); _require(model_id)
     rt = bedrock_runtime()
 
@@ -31,12 +41,11 @@ def generate_ad_idea(product_name: str, product_description: str, prompt_templat
             "content": [{"type": "text", "text": prompt}]
         }],
     }
-    resp = rt.invoke_model(modelId=model_id, body=json.dumps(body))
-    out = json.loads(resp["body"].read())
-    text = out["content"][0]["text"]
-    text = _unwrap_code_fence(text)
-    try:
-        data = json.loads(text)
-        return data.get("idea") or text.strip()
-    except Exception:
-        return text.strip()
+
+    def invoke():
+        resp = rt.invoke_model(modelId=model_id, body=json.dumps(body))
+        out = json.loads(resp["body"].read())
+        return out["content"][0]["text"]
+
+    config = {k: body[k] for k in ("anthropic_version", "max_tokens", "temperature")}
+    return get_llm_cache().call("generate_ad_idea", model_id, prompt, config, invoke, _parse_idea, use_cache)
@@ -1,7 +1,25 @@
 # app/tools/image_tools.py
-import os, json, base64, random
+import os, json, base64, random, threading
+from concurrent.futures import Future
 from tenacity import retry, stop_after_attempt, wait_exponential
-from .bedrock_clients import bedrock_runtime, put_bytes_s3
+from .bedrock_clients import bedrock_runtime, put_bytes_s3, s3
+from .asset_cache import AssetCache, cache_key
+
+# random  – new seed per call (original behaviour, never cached)
+# fixed   – IMAGE_SEED for every image
+# prompt  – seed derived from the prompt, so identical prompts give identical keyframes
+IMAGE_SEED_MODE = os.getenv("IMAGE_SEED_MODE", "random").lower()
+IMAGE_SEED = int(os.getenv("IMAGE_SEED", "42"))
+IMAGE_WIDTH, IMAGE_HEIGHT, IMAGE_QUALITY = 1280, 720, "standard"
+
+_MAX_SEED = 858993460
+
+# Keyframes of deterministic seeds are reused across runs and repeated scenes
+_image_cache = AssetCache("canvas")
+
+# Single-flight: identical keyframes requested concurrently (repeated scenes) share one Canvas call
+_inflight = {}
+_inflight_lock = threading.Lock()
 
 def _get_image_model():
     mid = os.getenv("BEDROCK_IMAGE_MODEL_ID")
@@ -14,31 +32,77 @@ def _scene_prompt(scene: dict) -> str:
     cam = scene.get("camera_directions", "")
     return (vis + (f" Camera: {cam}" if cam else "")).strip()
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential())
-def generate_scene_image(scene: dict, bucket: str, out_prefix: str) -> str:
-    """
-    out_prefix example: outputs/<RUN_ID>/scene image
-    writes: outputs/<RUN_ID>/scene image/scene_<id>.png
-    """
-    model_id = _get_image_model()
-    rt = bedrock_runtime()
+def _seed_for(prompt: str):
+    """(seed, deterministic) for the configured IMAGE_SEED_MODE."""
+    if IMAGE_SEED_MODE == "fixed":
+        return IMAGE_SEED, True
+    if IMAGE_SEED_MODE == "prompt":
+        return int(cache_key("seed", prompt, IMAGE_SEED)[:12], 16) % (_MAX_SEED + 1), True
+    return random.randint(0, _MAX_SEED), False
 
-    seed = random.randint(0, 858993460)
+@retry(stop=stop_after_attempt(3), wait=wait_exponential())
+def _invoke_canvas(model_id: str, prompt: str, seed: int) -> bytes:
     native = {
         "taskType": "TEXT_IMAGE",
-        "textToImageParams": {"text": _scene_prompt(scene)},
+        "textToImageParams": {"text": prompt},
         "imageGenerationConfig": {
             "seed": seed,
-            "quality": "standard",
-            "height": 720,
-            "width": 1280,
+            "quality": IMAGE_QUALITY,
+            "height": IMAGE_HEIGHT,
+            "width": IMAGE_WIDTH,
             "numberOfImages": 1,
         },
     }
-    resp = rt.invoke_model(modelId=model_id, body=json.dumps(native))
+    resp = bedrock_runtime().invoke_model(modelId=model_id, body=json.dumps(native))
     out = json.loads(resp["body"].read())
-    img = base64.b64decode(out["images"][0])
+    return base64.b64decode(out["images"][0])
 
+def generate_scene_image(scene: dict, bucket: str, out_prefix: str) -> str:
+    """
+    out_prefix example: outputs/<RUN_ID>/scene image
+    writes: outputs/<RUN_ID>/scene image/scene_<id>.png
+
+    With a deterministic IMAGE_SEED_MODE the keyframe is cached on
+    (model, prompt, seed, size, quality): a hit is a server-side copy and
+    concurrent requests for the same keyframe wait for one Canvas call.
+    """
+    model_id = _get_image_model()
+    prompt = _scene_prompt(scene)
+    seed, deterministic = _seed_for(prompt)
     key = f"{out_prefix}/scene_{scene['id']}.png"
-    put_bytes_s3(bucket, key, img, content_type="image/png")
+
+    if not deterministic:
+        put_bytes_s3(bucket, key, _invoke_canvas(model_id, prompt, seed), content_type="image/png")
+        return key
+
+    digest = cache_key("canvas", model_id, prompt, seed, IMAGE_WIDTH, IMAGE_HEIGHT, IMAGE_QUALITY)
+    if _image_cache.fetch(bucket, digest, "png", key):
+        print(f"[Canvas] cache hit for scene {scene['id']} ({digest[:12]})")
+        return key
+
+    with _inflight_lock:
+        leader = _inflight.get(digest)
+        if leader is None:
+            leader = _inflight[digest] = Future()
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        src_bucket, src_key = leader.result()
+        s3().copy_object(Bucket=bucket, Key=key, CopySource={"Bucket": src_bucket, "Key": src_key})
+        print(f"[Canvas] scene {scene['id']} reused an in-flight keyframe ({digest[:12]})")
+        return key
+
+    try:
+        img = _invoke_canvas(model_id, prompt, seed)
+        put_bytes_s3(bucket, key, img, content_type="image/png")
+        _image_cache.store(bucket, digest, "png", key, data=img)
+        leader.set_result((bucket, key))
+    except BaseException as exc:
+        leader.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(digest, None)
     return key
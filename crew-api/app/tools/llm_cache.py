@@ -0,0 +1,215 @@
+# app/tools/llm_cache.py
+# ------------------------------------------------------------
+# Memoization for the Bedrock text calls (idea, script, evaluation).
+#
+# Resubmitting a product with the same prompts repeats identical calls, so
+# results are cached on (model id, rendered prompt, inference config):
+#   memory      per-process LRU (LLM_CACHE_MAX_ENTRIES)
+#   persistent  LLM_CACHE_BACKEND: sqlite (local file, default) | s3 | none
+#
+# Only parsed results are cached, and only after the caller's parser
+# accepted them, so a malformed completion is never replayed.
+# Only deterministic calls (temperature 0) are cached by default: a sampled
+# call is cached when the caller passes use_cache=True, or for every caller
+# with LLM_CACHE_SAMPLED=1. use_cache=False always bypasses the cache.
+# ------------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from .asset_cache import ASSET_CACHE_PREFIX, cache_key
+from .bedrock_clients import put_json_s3, s3
+from .s3_utils import normalize_bucket_and_prefix
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite").lower()   # sqlite | s3 | none
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "crew_llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+LLM_CACHE_TTL_SECS = float(os.getenv("LLM_CACHE_TTL_SECS", str(7 * 24 * 3600)))   # 0 = never expire
+LLM_CACHE_SAMPLED = os.getenv("LLM_CACHE_SAMPLED", "0") == "1"
+
+
+# ---------- Persistent tiers ----------
+class SQLiteStore:
+    """Local file stand-in for a shared cache; safe across threads and worker processes (WAL)."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                   key TEXT PRIMARY KEY,
+                   fn TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               )"""
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if LLM_CACHE_TTL_SECS and time.time() - row[1] > LLM_CACHE_TTL_SECS:
+            return None
+        return row[0]
+
+    def put(self, key: str, fn: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, fn, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, fn, value, time.time()),
+            )
+
+
+class S3Store:
+    """Shared across hosts: s3://<bucket>/<ASSET_CACHE_PREFIX>/llm/<digest>.json"""
+
+    def __init__(self, bucket: Optional[str] = None, prefix: str = ASSET_CACHE_PREFIX):
+        if bucket is None:
+            bucket, _ = normalize_bucket_and_prefix(os.getenv("S3_BUCKET", ""), "")
+        if not bucket:
+            raise ValueError("LLM_CACHE_BACKEND=s3 needs S3_BUCKET.")
+        self.bucket = bucket
+        self.prefix = f"{prefix}/llm"
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            obj = s3().get_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}.json")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        if LLM_CACHE_TTL_SECS and time.time() - obj["LastModified"].timestamp() > LLM_CACHE_TTL_SECS:
+            return None
+        return json.loads(obj["Body"].read())["value"]
+
+    def put(self, key: str, fn: str, value: str) -> None:
+        put_json_s3(self.bucket, f"{self.prefix}/{key}.json", {"fn": fn, "value": value})
+
+
+def make_store(name: str = LLM_CACHE_BACKEND):
+    if name == "sqlite":
+        return SQLiteStore()
+    if name == "s3":
+        return S3Store()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {name!r} (expected 'sqlite', 's3' or 'none')")
+
+
+# ---------- Cache ----------
+class LLMCache:
+    def __init__(self, store=None, max_entries: int = LLM_CACHE_MAX_ENTRIES, enabled: bool = LLM_CACHE_ENABLED):
+        self.store = store
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "bypassed": 0}
+        )
+
+    def call(
+        self,
+        fn_name: str,
+        model_id: str,
+        prompt: str,
+        config: Dict[str, Any],
+        invoke: Callable[[], str],
+        parse: Callable[[str], Any],
+        use_cache: Optional[bool] = None,
+    ) -> Any:
+        """
+        Return parse(invoke()), memoized on (model_id, prompt, config).
+        invoke() returns the raw completion text; parse() must raise on
+        output it does not accept, in which case nothing is cached.
+        The result must be JSON-serializable; hits return a fresh copy.
+        """
+        if use_cache is None:
+            use_cache = LLM_CACHE_SAMPLED or not config.get("temperature")
+        if not (self.enabled and use_cache):
+            self._count(fn_name, "bypassed")
+            return parse(invoke())
+
+        key = cache_key("llm", model_id, prompt, config)
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+        if hit is not None:
+            self._count(fn_name, "memory_hits")
+            return json.loads(hit)
+
+        if self.store is not None:
+            try:
+                hit = self.store.get(key)
+            except Exception as exc:
+                print(f"[llm-cache] {fn_name}: persistent lookup failed: {exc}")
+                hit = None
+            if hit is not None:
+                self._remember(key, hit)
+                self._count(fn_name, "persistent_hits")
+                return json.loads(hit)
+
+        self._count(fn_name, "misses")
+        result = parse(invoke())
+        value = json.dumps(result, ensure_ascii=False)
+        self._remember(key, value)
+        if self.store is not None:
+            try:
+                self.store.put(key, fn_name, value)
+            except Exception as exc:
+                print(f"[llm-cache] {fn_name}: persistent write failed: {exc}")
+        return json.loads(value)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for fn, c in self._counts.items():
+                lookups = c["memory_hits"] + c["persistent_hits"] + c["misses"]
+                hits = c["memory_hits"] + c["persistent_hits"]
+                out[fn] = {**c, "hit_rate": round(hits / lookups, 3) if lookups else None}
+            return out
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, fn_name: str, what: str) -> None:
+        with self._lock:
+            self._counts[fn_name][what] += 1
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Process-wide cache; the persistent tier is opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                store = make_store() if LLM_CACHE_ENABLED else None
+            except Exception as exc:
+                print(f"[llm-cache] persistent tier unavailable, memory only: {exc}")
+                store = None
+            _cache = LLMCache(store)
+        return _cache
+
+
+def llm_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-function hit/miss counters."""
+    return get_llm_cache().stats()
@@ -0,0 +1,190 @@
+# app/tools/reel_tracker.py
+# ------------------------------------------------------------
+# One Nova Reel completion tracker shared by every run in the process.
+#
+# Instead of one sleeping thread per video job calling get_async_invoke,
+# callers register an invocationArn and get a Future back. A single poller
+# thread batch-polls all outstanding jobs with list_async_invokes (filtered
+# by status and submit time) and resolves the futures. The poll interval
+# backs off while nothing changes and snaps back when a job finishes or a
+# new one is registered. Futures are resolved on a small callback pool, so
+# their done-callbacks (S3 copies, cache puts, checkpoints, status hooks)
+# never hold up the poller.
+# ------------------------------------------------------------
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from .bedrock_clients import rt
+
+REEL_POLL_MIN_SECS = float(os.getenv("REEL_POLL_MIN_SECS", "5"))
+REEL_POLL_MAX_SECS = float(os.getenv("REEL_POLL_MAX_SECS", "30"))
+REEL_POLL_BACKOFF = float(os.getenv("REEL_POLL_BACKOFF", "1.5"))
+# Threads that resolve finished jobs and run their done-callbacks
+REEL_CALLBACK_WORKERS = int(os.getenv("REEL_CALLBACK_WORKERS", "4"))
+
+_TERMINAL = ("Completed", "Failed")
+
+
+class _Tracked:
+    def __init__(self, arn: str, timeout_secs: float):
+        self.arn = arn
+        self.future: Future = Future()
+        self.submitted = time.time()
+        self.deadline = self.submitted + timeout_secs
+        self.status: Optional[str] = None
+
+
+class ReelTracker:
+    """
+    Resolve Nova Reel async invocations for many waiters with one poller thread.
+
+    track(arn) returns a Future whose result is the invocation payload (same
+    shape as get_async_invoke: status, outputDataConfig, failureMessage...).
+    """
+
+    def __init__(self, min_poll: float = REEL_POLL_MIN_SECS, max_poll: float = REEL_POLL_MAX_SECS,
+                 backoff: float = REEL_POLL_BACKOFF, callback_workers: int = REEL_CALLBACK_WORKERS):
+        self.min_poll = min_poll
+        self.max_poll = max(min_poll, max_poll)
+        self.backoff = max(1.0, backoff)
+        self._callbacks = ThreadPoolExecutor(max_workers=max(1, callback_workers), thread_name_prefix="reel-done")
+        self._jobs: Dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._list_supported = True
+        self.polls = 0
+
+    # ---------- public ----------
+    def track(self, invocation_arn: str, timeout_secs: float = 1800) -> Future:
+        with self._lock:
+            job = self._jobs.get(invocation_arn)
+            if job is None:
+                job = self._jobs[invocation_arn] = _Tracked(invocation_arn, timeout_secs)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="reel-tracker", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return job.future
+
+    def outstanding(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    # ---------- poller ----------
+    def _loop(self) -> None:
+        interval = self.min_poll
+        while True:
+            # track() sets _wake so a new job is polled without waiting out the backoff
+            self._wake.wait(interval)
+            woken = self._wake.is_set()
+            self._wake.clear()
+            with self._lock:
+                if not self._jobs:
+                    self._thread = None
+                    return
+            try:
+                changed = self._poll_once()
+            except Exception as exc:
+                print(f"[Nova Reel] tracker poll failed: {exc}")
+                changed = False
+            if changed or woken:
+                interval = self.min_poll
+            else:
+                interval = min(interval * self.backoff, self.max_poll)
+
+    def _poll_once(self) -> bool:
+        with self._lock:
+            jobs = dict(self._jobs)
+        if not jobs:
+            return False
+        self.polls += 1
+
+        results = self._list_terminal(jobs) if self._list_supported else None
+        if results is None:
+            results = self._get_each(jobs)
+
+        changed = False
+        now = time.time()
+        for arn, job in jobs.items():
+            payload = results.get(arn)
+            if payload is not None:
+                st = payload.get("status", "")
+                if st != job.status:
+                    print(f"[Nova Reel] {arn.rsplit('/', 1)[-1]} status: {st}")
+                    job.status = st
+                if st in _TERMINAL or st == "Stopped":
+                    self._resolve(arn, result=payload)
+                    changed = True
+                    continue
+            if now > job.deadline:
+                self._resolve(arn, error=TimeoutError(
+                    f"Nova Reel async job timed out after {int(job.deadline - job.submitted)}s"))
+                changed = True
+        return changed
+
+    def _list_terminal(self, jobs: Dict[str, _Tracked]) -> Optional[Dict[str, dict]]:
+        """One paginated list_async_invokes call per terminal status for all outstanding jobs."""
+        earliest = min(j.submitted for j in jobs.values())
+        # Slack for clock skew between this host and Bedrock
+        since = datetime.fromtimestamp(earliest, tz=timezone.utc) - timedelta(minutes=5)
+        found: Dict[str, dict] = {}
+        try:
+            for status in _TERMINAL:
+                token = None
+                while True:
+                    kwargs = {"statusEquals": status, "submitTimeAfter": since, "maxResults": 100}
+                    if token:
+                        kwargs["nextToken"] = token
+                    page = rt().list_async_invokes(**kwargs)
+                    for summary in page.get("asyncInvokeSummaries", []):
+                        if summary.get("invocationArn") in jobs:
+                            found[summary["invocationArn"]] = summary
+                    token = page.get("nextToken")
+                    if not token or len(found) == len(jobs):
+                        break
+        except Exception as exc:
+            if "AccessDenied" in str(exc):
+                print("[Nova Reel] list_async_invokes not permitted; polling jobs individually")
+                self._list_supported = False
+                return None
+            raise
+        return found
+
+    def _get_each(self, jobs: Dict[str, _Tracked]) -> Dict[str, dict]:
+        found = {}
+        for arn in jobs:
+            try:
+                found[arn] = rt().get_async_invoke(invocationArn=arn)
+            except Exception as exc:
+                print(f"[Nova Reel] get_async_invoke failed for {arn}: {exc}")
+        return found
+
+    def _resolve(self, arn: str, result: Optional[dict] = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            job = self._jobs.pop(arn, None)
+        if job is None or job.future.done():
+            return
+        # Done-callbacks run inside set_result/set_exception: keep them off the poller thread
+        if error is not None:
+            self._callbacks.submit(job.future.set_exception, error)
+        else:
+            self._callbacks.submit(job.future.set_result, result)
+
+
+_tracker: Optional[ReelTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_reel_tracker() -> ReelTracker:
+    """Process-wide tracker shared by all runs."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ReelTracker()
+        return _tracker
@@ -1,7 +1,13 @@
 import json, os,re
 from tenacity import retry, stop_after_attempt, wait_exponential
 from .bedrock_clients import bedrock_runtime, put_json_s3
+from .llm_cache import get_llm_cache
 
+# Stream the completion (invoke_model_with_response_stream): scenes are handed to
+# on_scene as they close and hopeless output is abandoned early
+SCRIPT_STREAMING = os.getenv("SCRIPT_STREAMING", "0") == "1"
+# Give up when this much text arrives before the JSON object starts
+SCRIPT_STREAM_MAX_PREAMBLE = int(os.getenv("SCRIPT_STREAM_MAX_PREAMBLE", "400"))
 
 def _get_model_id():
     mid = os.getenv("BEDROCK_SCRIPT_MODEL_ID")
@@ -34,8 +40,172 @@ def _try_parse_json(raw: str):
             continue
     raise ValueError("Model did not return valid JSON after cleanup attempts.")
 
+def _parse_script(text: str) -> dict:
+    data = _try_parse_json(text)
+
+    # Minimal shape checks & defaults
+    scenes = data.get("scenes", [])
+    if not isinstance(scenes, list) or not scenes:
+        raise ValueError("Script JSON missing 'scenes' list.")
+    for i,sc in enumerate(scenes, 1):
+        _scene_defaults(sc, i)
+    return data
+
+def _scene_defaults(sc: dict, i: int) -> dict:
+    sc.setdefault("id", i)
+    sc.setdefault("duration_seconds", 6)
+    sc.setdefault("visual_description", "")
+    sc.setdefault("dialogue", "")
+    sc.setdefault("camera_directions", "")
+    sc.setdefault("sfx", "")
+    sc.setdefault("music_cue", "")
+    return sc
+
+
+class ScriptStreamParser:
+    """
+    Incremental scanner over a streamed script completion.
+
+    feed(text) returns the scene objects that closed in that chunk (with the
+    same defaults as _parse_script) and raises ValueError as soon as the
+    text can no longer become a script object: too much prose before the
+    first '{', mismatched brackets, a non-array "scenes" value or a scene
+    that isn't a JSON object. finish() parses the complete text.
+    """
+
+    def __init__(self, max_preamble: int = SCRIPT_STREAM_MAX_PREAMBLE):
+        self.max_preamble = max_preamble
+        self.text = ""
+        self._pos = 0
+        self._start = -1          # index of the top-level '{'
+        self._end = -1            # index of its closing '}'
+        self._stack = []          # open brackets
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string = None  # last complete string at depth 1 (candidate key)
+        self._pending_key = None  # key awaiting its value at depth 1
+        self._scenes_depth = None # stack depth inside the "scenes" array
+        self._scene_start = -1
+        self.scenes = []
+        self.closed = False
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        done = []
+        text = self.text
+        while self._pos < len(text) and not self.closed:
+            i, ch = self._pos, text[self._pos]
+            self._pos += 1
+            if self._start == -1:
+                if ch == "{":
+                    self._start = i
+                    self._stack.append("{")
+                elif i >= self.max_preamble:
+                    raise ValueError("Script stream: no JSON object after the preamble.")
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+            if (self._scenes_depth and len(self._stack) == self._scenes_depth
+                    and not ch.isspace() and ch not in ",{]"):
+                raise ValueError("Script stream: scene is not a JSON object.")
+            if ch == '"':
+                self._in_string, self._string_start = True, i
+            elif ch == ":" and len(self._stack) == 1:
+                self._pending_key = self._last_string
+            elif ch in "{[":
+                if len(self._stack) == 1 and self._pending_key == "scenes":
+                    if ch != "[":
+                        raise ValueError("Script stream: 'scenes' is not an array.")
+                    self._scenes_depth = 2
+                elif self._scenes_depth and len(self._stack) == self._scenes_depth:
+                    if ch != "{":
+                        raise ValueError("Script stream: scene is not a JSON object.")
+                    self._scene_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack or {"}": "{", "]": "["}[ch] != self._stack[-1]:
+                    raise ValueError("Script stream: mismatched brackets.")
+                self._stack.pop()
+                if self._scenes_depth and len(self._stack) == self._scenes_depth and ch == "}":
+                    done.append(self._close_scene(text[self._scene_start:i + 1]))
+                elif self._scenes_depth and len(self._stack) == self._scenes_depth - 1:
+                    self._scenes_depth = None   # "scenes" array closed
+                if not self._stack:
+                    self.closed, self._end = True, i
+            elif ch == "," and len(self._stack) == 1:
+                self._pending_key = None
+            elif not ch.isspace() and len(self._stack) == 1 and self._pending_key is None:
+                raise ValueError(f"Script stream: unexpected {ch!r} between keys.")
+        return done
+
+    def _close_scene(self, raw: str) -> dict:
+        try:
+            scene = json.loads(raw)
+        except Exception as exc:
+            raise ValueError(f"Script stream: scene {len(self.scenes) + 1} is not valid JSON: {exc}")
+        scene = _scene_defaults(scene, len(self.scenes) + 1)
+        self.scenes.append(scene)
+        return scene
+
+    @property
+    def json_text(self) -> str:
+        """The top-level object exactly, without surrounding prose or code fences."""
+        return self.text[self._start:self._end + 1] if self.closed else ""
+
+    def finish(self) -> dict:
+        if not self.closed:
+            raise ValueError("Script stream ended before the JSON object closed.")
+        return _parse_script(self.json_text)
+
+
+def _stream_completion(rt, model_id: str, body: dict, on_scene=None) -> str:
+    """Run the request with response streaming; returns the text once the script object closed."""
+    resp = rt.invoke_model_with_response_stream(modelId=model_id, body=json.dumps(body))
+    stream = resp["body"]
+    parser = ScriptStreamParser()
+    try:
+        for event in stream:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            data = json.loads(chunk["bytes"])
+            if data.get("type") != "content_block_delta":
+                continue
+            delta = data.get("delta", {})
+            if delta.get("type") != "text_delta":
+                continue
+            for scene in parser.feed(delta.get("text", "")):
+                if on_scene:
+                    on_scene(scene)
+            if parser.closed:
+                break   # trailing prose/code fence isn't needed
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    parser.finish()   # raise here (not after caching) if the object never closed or is invalid
+    return parser.json_text
+
 @retry(stop=stop_after_attempt(3), wait=wait_exponential())
-def generate_script(product_name: str, product_description: str, idea: str, prompt_template: str) -> dict:
+def generate_script(product_name: str, product_description: str, idea: str, prompt_template: str,
+                    use_cache: bool = None, on_scene=None, streaming: bool = None) -> dict:
+    """
+    With streaming (default SCRIPT_STREAMING) the response is parsed as it
+    arrives: on_scene(scene) is called as soon as each scene object closes,
+    and unusable output fails fast instead of after all 2000 tokens.
+    on_scene is also called for every scene of a cached script.
+    """
+    if streaming is None:
+        streaming = SCRIPT_STREAMING
     model_id = _get_model_id()
     rt = bedrock_runtime()
 
@@ -53,23 +223,27 @@ def generate_script(product_name: str, product_description: str, idea: str, prom
             "content": [{"type": "text", "text": prompt}]
         }],
     }
-    resp = rt.invoke_model(modelId=model_id, body=json.dumps(body))
-    out = json.loads(resp["body"].read())
-    text = out["content"][0]["text"]
-    data = _try_parse_json(text)
 
-    # Minimal shape checks & defaults
-    scenes = data.get("scenes", [])
-    if not isinstance(scenes, list) or not scenes:
-        raise ValueError("Script JSON missing 'scenes' list.")
-    for i,sc in enumerate(scenes, 1):
-        sc.setdefault("id", i)
-        sc.setdefault("duration_seconds", 6)
-        sc.setdefault("visual_description", "")
-        sc.setdefault("dialogue", "")
-        sc.setdefault("camera_directions", "")
-        sc.setdefault("sfx", "")
-        sc.setdefault("music_cue", "")
+    emitted = set()
+
+    def emit(scene):
+        emitted.add(scene["id"])
+        if on_scene:
+            on_scene(scene)
+
+    def invoke():
+        if streaming:
+            return _stream_completion(rt, model_id, body, emit)
+        resp = rt.invoke_model(modelId=model_id, body=json.dumps(body))
+        out = json.loads(resp["body"].read())
+        return out["content"][0]["text"]
+
+    config = {k: body[k] for k in ("anthropic_version", "max_tokens", "temperature")}
+    data = get_llm_cache().call("generate_script", model_id, prompt, config, invoke, _parse_script, use_cache)
+    # Cache hits and non-streamed calls report their scenes once the script is complete
+    for scene in data["scenes"]:
+        if scene["id"] not in emitted:
+            emit(scene)
     return data
 
 def save_script_s3(script, bucket, key):
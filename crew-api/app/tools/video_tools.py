@@ -1,15 +1,21 @@
 import os
 import json
+from concurrent.futures import Future
 from typing import Dict, Tuple
 from .bedrock_clients import (
     reel_start_async,
-    reel_wait_for_completion,
+    reel_track,
     s3,http_url
 )
+from .asset_cache import AssetCache, cache_key
 
 REEL_DIMENSION = os.getenv("REEL_DIMENSION", "1280x720")  # TEXT_VIDEO requires 1280x720
 REEL_FPS = int(os.getenv("REEL_FPS", "24"))
 VIDEO_MODEL_ID = os.getenv("BEDROCK_VIDEO_MODEL_ID", "amazon.nova-reel-v1:1")
+# Reel outputs are deterministic for a given model_input (fixed seed); reuse them for this many days
+REEL_CACHE_TTL_DAYS = int(os.getenv("REEL_CACHE_TTL_DAYS", "30"))
+
+_reel_cache = AssetCache("reel", ttl_days=REEL_CACHE_TTL_DAYS)
 
 def _scene_prompt(scene: Dict) -> str:
     # Build a concise prompt from scene fields
@@ -87,16 +93,10 @@ def _parse_s3_uri(uri: str) -> Tuple[str, str]:
 
 
 
-def generate_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_prefix: str) -> str:
-    """
-    Start a Nova Reel TEXT_VIDEO job (6s) and copy its output.mp4 to:
-      s3://{bucket}/{out_prefix}/scene_{scene_id}.mp4
-
-    Returns the exact destination key (relative path inside the bucket).
-    """
+def _reel_model_input(scene: Dict) -> Dict:
     # Build model input for 6s TEXT_VIDEO
     prompt = _scene_prompt(scene)
-    model_input = {
+    return {
         "taskType": "TEXT_VIDEO",
         "textToVideoParams": {"text": prompt},
         "videoGenerationConfig": {
@@ -107,15 +107,19 @@ def generate_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_
         },
     }
 
-    base_s3_uri = f"s3://{bucket}"
-    arn = reel_start_async(VIDEO_MODEL_ID, model_input, base_s3_uri)
-    res = reel_wait_for_completion(arn, poll_secs=10, max_wait_secs=1800)
+
+def _scene_video_key(scene: Dict, out_prefix: str) -> str:
+    return f"{out_prefix.rstrip('/')}/scene_{scene.get('id', '1')}.mp4"
+
+
+def _copy_reel_output(res: Dict, bucket: str, scene: Dict, out_prefix: str) -> str:
     status = res.get("status")
 
     if status != "Completed":
-        raise RuntimeError(f"Nova Reel job failed. Status={status}, details={json.dumps(res)}")
+        raise RuntimeError(f"Nova Reel job failed. Status={status}, details={json.dumps(res, default=str)}")
 
     # Bedrock tells us which prefix it used
+    base_s3_uri = f"s3://{bucket}"
     out_cfg = res.get("outputDataConfig", {}).get("s3OutputDataConfig", {})
     job_s3_uri = out_cfg.get("s3Uri", base_s3_uri)  # e.g., s3://bucket/prefix
     src_bucket, src_prefix = _parse_s3_uri(job_s3_uri)
@@ -125,7 +129,7 @@ def generate_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_
 
     # Our destination per scene
     scene_id = scene.get("id", "1")
-    dest_key = f"{out_prefix.rstrip('/')}/scene_{scene_id}.mp4"
+    dest_key = _scene_video_key(scene, out_prefix)
 
     # Copy into our run folder (so it’s easy to locate)
     s3().copy_object(
@@ -138,3 +142,47 @@ def generate_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_
 
     # ✅ Always return exact final S3 key (usable for presigned URL)
     return dest_key
+
+
+def start_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_prefix: str) -> Future:
+    """
+    Non-blocking variant of generate_scene_video_from_image: starts the Nova
+    Reel job and returns a Future resolving to the destination key. Waiting is
+    done by the shared ReelTracker, so no thread is parked per job.
+
+    The seed is fixed, so a model_input seen before is served from the Reel
+    cache (server-side copy of the earlier output.mp4) without a new job.
+    """
+    model_input = _reel_model_input(scene)
+    digest = cache_key("reel", VIDEO_MODEL_ID, model_input)
+    done: Future = Future()
+
+    dest_key = _scene_video_key(scene, out_prefix)
+    if _reel_cache.fetch(bucket, digest, "mp4", dest_key):
+        print(f"[Nova Reel] cache hit for scene {scene.get('id', '1')} ({digest[:12]})")
+        done.set_result(dest_key)
+        return done
+
+    base_s3_uri = f"s3://{bucket}"
+    arn = reel_start_async(VIDEO_MODEL_ID, model_input, base_s3_uri)
+
+    def _on_reel_done(job: Future):
+        try:
+            key = _copy_reel_output(job.result(), bucket, scene, out_prefix)
+            _reel_cache.store(bucket, digest, "mp4", key)
+            done.set_result(key)
+        except BaseException as exc:
+            done.set_exception(exc)
+
+    reel_track(arn, timeout_secs=1800).add_done_callback(_on_reel_done)
+    return done
+
+
+def generate_scene_video_from_image(bucket: str, img_key: str, scene: Dict, out_prefix: str) -> str:
+    """
+    Start a Nova Reel TEXT_VIDEO job (6s) and copy its output.mp4 to:
+      s3://{bucket}/{out_prefix}/scene_{scene_id}.mp4
+
+    Returns the exact destination key (relative path inside the bucket).
+    """
+    return start_scene_video_from_image(bucket, img_key, scene, out_prefix).result()
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("tenacity")
+
+from app import callbacks  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def allowlist(monkeypatch):
+    monkeypatch.setattr(callbacks, "CALLBACK_ALLOWED_PREFIXES", ["https://api.example.com/ads/callbacks"])
+
+
+@pytest.mark.parametrize("url", [
+    "https://api.example.com/ads/callbacks",
+    "https://api.example.com/ads/callbacks/crew",
+    "https://API.example.com:443/ads/callbacks/crew",
+])
+def test_allowed(url):
+    assert callbacks.callback_allowed(url)
+
+
+@pytest.mark.parametrize("url", [
+    "https://api.example.com.evil.net/ads/callbacks/crew",
+    "https://api.example.com@evil.net/ads/callbacks/crew",
+    "https://user:pw@api.example.com/ads/callbacks/crew",
+    "http://api.example.com/ads/callbacks/crew",
+    "https://api.example.com:8443/ads/callbacks/crew",
+    "https://api.example.com/ads/callbacksx",
+    "https://api.example.com/ads/callbacks/../admin",
+    "https://api.example.com/other",
+    "ftp://api.example.com/ads/callbacks/crew",
+])
+def test_refused(url):
+    assert not callbacks.callback_allowed(url)
+
+
+def test_empty_allowlist_refuses_everything(monkeypatch):
+    monkeypatch.setattr(callbacks, "CALLBACK_ALLOWED_PREFIXES", [])
+    assert not callbacks.callback_allowed("https://api.example.com/ads/callbacks/crew")
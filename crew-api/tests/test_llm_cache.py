@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("boto3")
+
+from app.tools.llm_cache import LLMCache  # noqa: E402
+
+
+def _call(cache, config, use_cache=None):
+    calls = []
+
+    def invoke():
+        calls.append(1)
+        return '{"ok": true}'
+
+    for _ in range(2):
+        cache.call("fn", "model", "prompt", config, invoke, lambda raw: {"ok": True}, use_cache)
+    return len(calls)
+
+
+def test_deterministic_calls_are_cached():
+    assert _call(LLMCache(enabled=True), {"temperature": 0}) == 1
+
+
+def test_sampled_calls_bypass_the_cache_by_default():
+    assert _call(LLMCache(enabled=True), {"temperature": 0.5}) == 2
+
+
+def test_sampled_callers_can_opt_in():
+    assert _call(LLMCache(enabled=True), {"temperature": 0.5}, use_cache=True) == 1
+
+
+def test_use_cache_false_always_bypasses():
+    assert _call(LLMCache(enabled=True), {"temperature": 0}, use_cache=False) == 2
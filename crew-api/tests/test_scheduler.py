@@ -0,0 +1,76 @@
+import threading
+import time
+
+from app.scheduler import Stage, StageScheduler
+
+
+class _RestoreFirstScene:
+    """Checkpoint that has the first scene's image; every other stage runs."""
+
+    def restore(self, stage):
+        return {"image_1": "restored.png"} if stage.name == "image_1" else None
+
+    def record(self, stage, outputs):
+        pass
+
+
+def test_restored_first_scene_does_not_finish_group_while_fan_out_is_registered():
+    finished = []
+    lock = threading.Lock()
+
+    def on_group_finish(group):
+        with lock:
+            finished.append((group, sorted(n for n, s in scheduler.stages.items() if s.group == group)))
+
+    scheduler = StageScheduler(max_workers=4, checkpoint=_RestoreFirstScene(), on_group_finish=on_group_finish)
+
+    def scene_stages(n):
+        for i in range(1, n + 1):
+            yield Stage(f"image_{i}", lambda i=i: f"image_{i}.png", outputs=[f"image_{i}"], group="video")
+            # Give a restored image_1 time to finish while later scenes are still being built
+            time.sleep(0.05)
+
+    def plan(script):
+        scheduler.add_all(scene_stages(3))
+        return 3
+
+    scheduler.add_all([
+        Stage("script", lambda: "script", outputs=["script"], checkpoint=False),
+        Stage("plan", plan, inputs=["script"], outputs=["scene_count"], checkpoint=False),
+    ])
+    artifacts = scheduler.run()
+
+    assert artifacts["image_1"] == "restored.png"
+    assert scheduler.stages["image_1"].restored
+    assert finished == [("video", ["image_1", "image_2", "image_3"])]
+
+
+def test_add_all_rejects_the_whole_batch_on_a_duplicate_output():
+    scheduler = StageScheduler()
+    scheduler.add(Stage("a", lambda: 1, outputs=["x"]))
+    try:
+        scheduler.add_all([Stage("b", lambda: 2, outputs=["y"]), Stage("c", lambda: 3, outputs=["x"])])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate output accepted")
+    assert list(scheduler.stages) == ["a"]
+
+
+def test_mark_cached_flags_only_the_calling_stage():
+    from app.scheduler import mark_cached
+
+    def from_cache():
+        mark_cached()
+        return "hit.png"
+
+    scheduler = StageScheduler(max_workers=2)
+    scheduler.add_all([
+        Stage("image_1", from_cache, outputs=["image_1"]),
+        Stage("image_2", lambda: "fresh.png", outputs=["image_2"]),
+    ])
+    scheduler.run()
+    mark_cached()   # outside a stage: no-op
+
+    assert scheduler.stages["image_1"].cached
+    assert not scheduler.stages["image_2"].cached